@@ -0,0 +1,122 @@
+"""
+刷新极影视插件压测
+
+启动极空间模拟服务，按指定配置执行一次全部分类刷新，统计：
+  - 刷新总耗时
+  - 各接口请求次数、连接数
+  - 完成检测延迟：模拟服务中分类刷新完成到插件查询到完成状态的时间
+  - 发送的通知数量
+
+需要在MoviePilot源码目录下运行（或通过 --moviepilot 指定），插件从本仓库加载：
+  python benchmarks/bench_zspacemediafresh.py --moviepilot /path/to/MoviePilot \\
+      --scan-duration 5-30 --concurrency 3 --pollmode backoff --runs 3
+"""
+import argparse
+import importlib.util
+import os
+import sys
+import time
+from pathlib import Path
+
+from zspace_mock import ZspaceMock, parse_range
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def load_plugin(plugin_dir: Path):
+    """
+    以 app.plugins.zspacemediafresh 加载插件
+    """
+    name = f"app.plugins.{plugin_dir.name}"
+    spec = importlib.util.spec_from_file_location(name, plugin_dir / "__init__.py",
+                                                  submodule_search_locations=[str(plugin_dir)])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module.ZspaceMediaFresh
+
+
+def run_once(plugin_class, mock: ZspaceMock, config: dict) -> dict:
+    """
+    执行一次全部分类刷新
+    """
+    mock.reset()
+    plugin = plugin_class()
+    notices = []
+    plugin.post_message = lambda **kwargs: notices.append(kwargs)
+    plugin.init_plugin({
+        **config,
+        "enabled": False,
+        "onlyonce": False,
+        "flushall": True,
+        "notify": True,
+        "zsphost": mock.url,
+        "zspcookie": "token=mock; device_id=mock"
+    })
+    start = time.time()
+    plugin.refresh(wait=True)
+    wall = time.time() - start
+    plugin.stop_service()
+    stats = mock.stats()
+    stats["wall"] = round(wall, 2)
+    stats["notices"] = len(notices)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="刷新极影视插件压测")
+    parser.add_argument("--moviepilot", default=os.environ.get("MOVIEPILOT_ROOT", "."), help="MoviePilot源码目录")
+    parser.add_argument("--plugin", default=str(ROOT / "plugins" / "zspacemediafresh"), help="插件目录")
+    parser.add_argument("--runs", type=int, default=1, help="执行次数")
+    # 模拟服务
+    parser.add_argument("--classifications", default="电影,电视剧,动漫,纪录片,综艺", help="极影视分类名，逗号分割")
+    parser.add_argument("--scan-duration", default="5-30", help="分类刷新耗时(秒)，如 5-30")
+    parser.add_argument("--latency", type=float, default=0, help="接口响应延迟(毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0, help="请求出错概率 0-1")
+    # 插件配置
+    parser.add_argument("--concurrency", type=int, default=3)
+    parser.add_argument("--pollmode", default="backoff", choices=["backoff", "fixed"])
+    parser.add_argument("--pollinitial", type=float, default=5)
+    parser.add_argument("--pollmax", type=float, default=120)
+    parser.add_argument("--waittime", type=int, default=60)
+    parser.add_argument("--engine", default="thread", choices=["thread", "asyncio"])
+    parser.add_argument("--maxduration", type=float, default=None, help="最长刷新时间(分钟)，不指定按预计耗时自动设置，0为不限制")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(Path(args.moviepilot).resolve()))
+    plugin_class = load_plugin(Path(args.plugin).resolve())
+    config = {
+        "concurrency": args.concurrency,
+        "pollmode": args.pollmode,
+        "pollinitial": args.pollinitial,
+        "pollmax": args.pollmax,
+        "waittime": args.waittime,
+        "engine": args.engine,
+        "maxduration": args.maxduration
+    }
+    mock = ZspaceMock(classifications=args.classifications.replace("，", ",").split(","),
+                      scan_duration=parse_range(args.scan_duration),
+                      latency=args.latency / 1000,
+                      error_rate=args.error_rate).start()
+    print(f"插件配置：{config}")
+    print(f"{'次数':<6}{'总耗时(秒)':<12}{'请求数':<8}{'查询状态':<10}{'连接数':<8}{'错误':<6}"
+          f"{'检测延迟均值':<14}{'检测延迟最大':<14}{'通知':<6}")
+    results = []
+    try:
+        for index in range(args.runs):
+            stats = run_once(plugin_class, mock, config)
+            results.append(stats)
+            print(f"{index + 1:<6}{stats['wall']:<12}{stats['total_requests']:<8}"
+                  f"{stats['requests'].get('/zvideo/classification/rescan/result', 0):<10}"
+                  f"{stats['connections']:<8}{stats['errors']:<6}"
+                  f"{str(stats['detection_latency_avg']):<14}{str(stats['detection_latency_max']):<14}"
+                  f"{stats['notices']:<6}")
+    finally:
+        mock.stop()
+    if len(results) > 1:
+        print(f"平均总耗时：{sum(r['wall'] for r in results) / len(results):.2f}秒，"
+              f"平均请求数：{sum(r['total_requests'] for r in results) / len(results):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+极空间web接口模拟服务
+
+模拟插件用到的极空间接口，用于在没有极空间的环境下调试和压测插件：
+  /zvideo/classification/list           极影视分类列表
+  /zvideo/classification/rescan         提交分类刷新
+  /zvideo/classification/rescan/result  查询分类刷新状态，刷新中 task_status 为4
+  /action/list                          系统消息列表
+  /action/known                         系统消息设为已读
+另有 /__stats 查看请求统计，/__reset 清空统计和刷新任务
+
+单独运行：
+  python benchmarks/zspace_mock.py --port 5055 --scan-duration 5-30 --latency 50 --error-rate 0.01
+插件中极空间地址填 http://127.0.0.1:5055 ，cookie 填 token=mock; device_id=mock 即可
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+# 刷新中
+TASK_RUNNING = 4
+# 刷新完成
+TASK_FINISHED = 2
+
+
+class ZspaceMock:
+    """
+    极空间接口模拟服务
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 classifications: List[str] = None,
+                 scan_duration: Tuple[float, float] = (5, 30),
+                 scan_durations: Dict[str, float] = None,
+                 latency: float = 0,
+                 error_rate: float = 0,
+                 messages: int = 0):
+        """
+        :param classifications: 极影视分类名
+        :param scan_duration: 分类刷新耗时范围(秒)，每次刷新随机取值
+        :param scan_durations: 指定分类的刷新耗时(秒)，优先于 scan_duration
+        :param latency: 每个请求的响应延迟(秒)
+        :param error_rate: 请求出错的概率，出错时一半返回HTTP 500，一半返回错误码
+        :param messages: 初始未读系统消息数量
+        """
+        self.classifications = classifications or ["电影", "电视剧", "动漫", "纪录片", "综艺"]
+        self.scan_duration = scan_duration
+        self.scan_durations = scan_durations or {}
+        self.latency = latency
+        self.error_rate = error_rate
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+        self.reset()
+        self.add_messages(messages)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def start(self):
+        """
+        后台线程启动服务
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        """
+        清空统计和刷新任务
+        """
+        with self._lock:
+            self.requests: Dict[str, int] = {}
+            self.connections = 0
+            self.errors = 0
+            # task_id -> 刷新任务
+            self.tasks: Dict[str, dict] = {}
+            self._task_seq = 0
+            self.messages: Dict[int, dict] = getattr(self, "messages", {})
+            self._message_seq = max(self.messages.keys(), default=0)
+
+    def add_messages(self, count: int, title: str = "备份任务完成"):
+        """
+        新增未读系统消息
+        """
+        with self._lock:
+            for _ in range(count):
+                self._message_seq += 1
+                self.messages[self._message_seq] = {
+                    "id": self._message_seq,
+                    "title": title,
+                    "content": f"{title} #{self._message_seq}",
+                    "created_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+                    "is_new": 1
+                }
+
+    def stats(self) -> dict:
+        """
+        请求统计，detection_latency 为刷新完成到插件查询到完成状态的时间
+        """
+        with self._lock:
+            latencies = [task["detected"] - task["finish"] for task in self.tasks.values() if task["detected"]]
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "connections": self.connections,
+                "errors": self.errors,
+                "tasks": len(self.tasks),
+                "detected": len(latencies),
+                "detection_latency_avg": round(sum(latencies) / len(latencies), 2) if latencies else None,
+                "detection_latency_max": round(max(latencies), 2) if latencies else None,
+                "unread_messages": len([m for m in self.messages.values() if m["is_new"]])
+            }
+
+    def _scan_duration(self, classify: str) -> float:
+        if classify in self.scan_durations:
+            return self.scan_durations[classify]
+        return random.uniform(*self.scan_duration)
+
+    def handle(self, path: str, form: dict) -> Tuple[int, Optional[dict]]:
+        """
+        处理接口请求，返回状态码和json数据，None 为非json的错误页面
+        """
+        if path == "/__stats":
+            return 200, self.stats()
+        if path == "/__reset":
+            self.reset()
+            return 200, {"code": "200"}
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            if random.random() < self.error_rate:
+                self.errors += 1
+                if random.random() < 0.5:
+                    return 500, None
+                return 200, {"code": "E000500", "msg": "模拟错误", "data": None}
+            if path == "/zvideo/classification/list":
+                return 200, {"code": "200",
+                             "data": [{"id": str(index + 1), "name": name}
+                                      for index, name in enumerate(self.classifications)]}
+            elif path == "/zvideo/classification/rescan":
+                index = int(form.get("classification_id") or 0) - 1
+                if not 0 <= index < len(self.classifications):
+                    return 200, {"code": "N120001", "msg": "分类不存在", "data": None}
+                self._task_seq += 1
+                task_id = str(self._task_seq)
+                start = time.time()
+                self.tasks[task_id] = {
+                    "classify": self.classifications[index],
+                    "start": start,
+                    "finish": start + self._scan_duration(self.classifications[index]),
+                    "detected": None
+                }
+                return 200, {"code": "200", "data": {"task_id": task_id}}
+            elif path == "/zvideo/classification/rescan/result":
+                task = self.tasks.get(form.get("task_id"))
+                if not task:
+                    return 200, {"code": "N120024", "data": {"task_status": TASK_FINISHED}}
+                now = time.time()
+                if now < task["finish"]:
+                    return 200, {"code": "200", "data": {"task_status": TASK_RUNNING}}
+                if not task["detected"]:
+                    task["detected"] = now
+                return 200, {"code": "200", "data": {"task_status": TASK_FINISHED}}
+            elif path == "/action/list":
+                start_id = int(form.get("start_id") or 0)
+                num = int(form.get("num") or 20)
+                # 按消息ID倒序分页，start_id 为上一页最后一条消息ID
+                ids = sorted([mid for mid in self.messages if not start_id or mid < start_id], reverse=True)
+                return 200, {"code": "200", "data": {"list": [dict(self.messages[mid]) for mid in ids[:num]]}}
+            elif path == "/action/known":
+                for mid in str(form.get("ids") or "").split(","):
+                    if mid.strip().isdigit() and int(mid) in self.messages:
+                        self.messages[int(mid)]["is_new"] = 0
+                return 200, {"code": "200", "data": None}
+            return 404, None
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                with mock._lock:
+                    mock.connections += 1
+                super().setup()
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                self.do_POST()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length).decode() if length else ""
+                form = {key: value[0] for key, value in parse_qs(body).items()}
+                if mock.latency:
+                    time.sleep(mock.latency)
+                status, data = mock.handle(urlparse(self.path).path, form)
+                if data is None:
+                    raw = f"<html><body>{status}</body></html>".encode()
+                    content_type = "text/html"
+                else:
+                    raw = json.dumps(data, ensure_ascii=False).encode()
+                    content_type = "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        return Handler
+
+
+def parse_range(value: str) -> Tuple[float, float]:
+    """
+    解析 5-30 或 10 格式的时间范围
+    """
+    if "-" in value:
+        low, high = value.split("-", 1)
+        return float(low), float(high)
+    return float(value), float(value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="极空间接口模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5055)
+    parser.add_argument("--classifications", default="电影,电视剧,动漫,纪录片,综艺", help="极影视分类名，逗号分割")
+    parser.add_argument("--scan-duration", default="5-30", help="分类刷新耗时(秒)，如 5-30")
+    parser.add_argument("--latency", type=float, default=0, help="接口响应延迟(毫秒)")
+    parser.add_argument("--error-rate", type=float, default=0, help="请求出错概率 0-1")
+    parser.add_argument("--messages", type=int, default=0, help="初始未读系统消息数量")
+    args = parser.parse_args()
+    mock = ZspaceMock(host=args.host,
+                      port=args.port,
+                      classifications=args.classifications.replace("，", ",").split(","),
+                      scan_duration=parse_range(args.scan_duration),
+                      latency=args.latency / 1000,
+                      error_rate=args.error_rate,
+                      messages=args.messages)
+    print(f"极空间模拟服务已启动：{mock.url}")
+    try:
+        mock.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,30 @@
 from datetime import datetime, timedelta
 from typing import Optional, Any, List, Dict, Tuple
 
+import asyncio
+import json
+import math
 import pytz
 import re
 import random
+import threading
 import time
+import uuid
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from threading import Event as ThreadEvent
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
+from sqlalchemy import func, or_
 
+from app import schemas
 from app.core.event import eventmanager, Event
-from app.db.transferhistory_oper import TransferHistoryOper
+from app.db import SessionFactory
+from app.db.models.transferhistory import TransferHistory
 from app.core.config import settings
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.zspacemediafresh.zspaceclient import ZspaceClient
 from app.schemas.types import EventType, NotificationType
-from app.utils.http import RequestUtils
 
 
 class ZspaceMediaFresh(_PluginBase):
@@ -25,7 +35,7 @@ class ZspaceMediaFresh(_PluginBase):
     # 插件图标
     plugin_icon = "https://raw.githubusercontent.com/gxterry/MoviePilot-Plugins/main/icons/Zspace_B.png"
     # 插件版本
-    plugin_version = "1.5.2"
+    plugin_version = "1.24.0"
     # 插件作者
     plugin_author = "gxterry"
     # 作者主页
@@ -53,11 +63,65 @@ class ZspaceMediaFresh(_PluginBase):
     _notify = False
     _notifyaggregation = False
     _unit=None
+    _concurrency = None
+    _pollmode = None
+    _pollinitial = None
+    _pollmax = None
+    _eventrefresh = False
+    _debounce = None
+    _cachettl = None
+    _pathmapping = None
+    _zspnodes = None
+    # 极空间节点，单独配置的极空间为默认节点(名称为空)
+    # {"name", "client", "concurrency", "startswith", "moivelib", "tvlib", "path_index", "path_prefixes", "classify_cache"}
+    _nodes: List[dict] = []
+    # 刷新中的分类 分类名 -> 刷新结束事件
+    _flight_classify: Dict[str, ThreadEvent] = None
+    # 刷新期间又收到请求、需补充刷新的分类
+    _followup_classify: set = None
+    _flight_lock = threading.Lock()
+    # 刷新记录保留条数
+    _history_limit = 200
+    # 插件数据读写锁
+    _data_lock = threading.Lock()
+    _engine = None
+    _maxduration = None
+    # 连续查询失败次数达到该值视为刷新停滞
+    _stall_failures = 5
+    # 未配置最长刷新时间时，按预计耗时的倍数自动设置，不低于下限(分钟)
+    _timeout_factor = 4
+    _timeout_floor = 180
+    # 刷新耗时预估的平滑系数，越大越偏向最近一次耗时
+    _estimate_alpha = 0.3
+    # asyncio刷新引擎的事件循环
+    _loop: Optional[asyncio.AbstractEventLoop] = None
+    # 入库完成事件待刷新的目录 目录 -> 媒体类型
+    _pending_dests: Dict[str, str] = None
+    _pending_lock = threading.Lock()
     _scheduler: Optional[BackgroundScheduler] = None
+    # 刷新任务队列，远程命令和API提交的刷新逐个执行
+    _job_executor: Optional[ThreadPoolExecutor] = None
+    # 刷新任务 任务ID -> 任务信息，只保存在内存中
+    _jobs: Dict[str, dict] = None
+    _jobs_lock = threading.Lock()
+    # 刷新任务保留个数
+    _job_limit = 50
+    # 退出事件，每个实例初始化时单独创建
+    _event: Optional[ThreadEvent] = None
 
     def init_plugin(self, config: dict = None):
         # 停止现有任务
         self.stop_service()
+        self._event = ThreadEvent()
+        # 刷新中的分类按实例记录，现有任务已停止
+        self._flight_classify = {}
+        self._followup_classify = set()
+        # 刷新任务按实例记录，重新初始化时保留已结束的任务供查询
+        if self._jobs is None:
+            self._jobs = {}
+        # 入库待刷新的目录按实例记录，重新初始化时保留，下次入库时一起刷新
+        if self._pending_dests is None:
+            self._pending_dests = {}
 
         if config:
             self._enabled = config.get("enabled")
@@ -75,16 +139,53 @@ class ZspaceMediaFresh(_PluginBase):
             self._notify = config.get("notify")
             self._notifyaggregation =config.get("notifyaggregation")
             self._unit =config.get("unit") or "day"
+            self._concurrency = config.get("concurrency") or 3
+            self._pollmode = config.get("pollmode") or "backoff"
+            self._pollinitial = config.get("pollinitial") or 5
+            self._pollmax = config.get("pollmax") or 120
+            self._eventrefresh = config.get("eventrefresh")
+            self._debounce = config.get("debounce") or 30
+            self._cachettl = config.get("cachettl")
+            if self._cachettl is None or self._cachettl == "":
+                self._cachettl = 60
+            self._pathmapping = config.get("pathmapping")
+            self._engine = config.get("engine") or "thread"
+            # 留空按分类预计耗时自动设置，0为不限制
+            self._maxduration = config.get("maxduration")
+            self._zspnodes = config.get("zspnodes")
             if self._zsphost:           
                 if not self._zsphost.startswith("http"):
                     self._zsphost = "http://" + self._zsphost
                 if  self._zsphost.endswith("/"):
                     self._zsphost = self._zsphost[:-1]
+            # 极空间节点，配置变更后重新获取分类
+            self._nodes = self.__build_nodes()
+            if self._engine == "asyncio" and self._nodes:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="极影视刷新引擎", daemon=True).start()
+            if self._nodes:
+                self._job_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="极影视刷新任务")
+            # 重启前未完成的刷新
+            inflight = self.get_data("inflight") if self._enabled and self._nodes else None
+            if inflight:
+                # 已删除的极空间不再恢复
+                names = [node["name"] for node in self._nodes]
+                if any((record.get("node") or "") not in names for record in inflight):
+                    inflight = [record for record in inflight if (record.get("node") or "") in names]
+                    self.save_data("inflight", inflight)
             # 加载模块
             if self._enabled or self._onlyonce:
                 # 定时服务
                 self._scheduler = BackgroundScheduler(timezone=settings.TZ)
 
+                # 继续重启前未完成的刷新，不重复提交已在刷新中的分类
+                if inflight:
+                    self._scheduler.add_job(self.__resume_refresh, 'date',
+                                            run_date=datetime.now(
+                                                tz=pytz.timezone(settings.TZ)) + timedelta(seconds=3),
+                                            args=[inflight],
+                                            name="极影视恢复刷新")
+
                 # 立即运行一次
                 if self._onlyonce:
                     logger.info(f"极影视刷新服务启动，立即运行一次")
@@ -106,14 +207,84 @@ class ZspaceMediaFresh(_PluginBase):
                         logger.error(f"定时任务配置错误：{str(err)}")
                         # 推送实时消息
                         self.systemmessage.put(f"执行周期配置错误：{err}")
-                # 启动任务
-                if self._scheduler.get_jobs():
+                # 启动任务，入库刷新需要调度器常驻
+                if self._scheduler.get_jobs() or (self._enabled and self._eventrefresh):
                     self._scheduler.print_jobs()
                     self._scheduler.start()
 
     def get_state(self) -> bool:
         return self._enabled
 
+    def __build_nodes(self) -> List[dict]:
+        """
+        构建极空间节点：单独配置的极空间为默认节点，其余按多极空间配置添加，各自使用独立的连接池
+        """
+        configs = []
+        if self._zsphost and self._zspcookie:
+            configs.append({"name": "", "host": self._zsphost, "cookie": self._zspcookie,
+                            "startswith": self._startswith, "moivelib": self._moivelib, "tvlib": self._tvlib,
+                            "pathmapping": self._pathmapping, "concurrency": self._concurrency})
+        if self._zspnodes:
+            try:
+                items = json.loads(self._zspnodes)
+                if not isinstance(items, list):
+                    raise ValueError("需要JSON数组")
+            except Exception as err:
+                logger.error(f"多极空间配置错误：{str(err)}")
+                # 推送实时消息
+                self.systemmessage.put(f"多极空间配置错误：{err}")
+                items = []
+            for item in items:
+                name = str(item.get("name") or "").strip() if isinstance(item, dict) else ""
+                if not name or not item.get("host") or not item.get("cookie"):
+                    logger.error(f"多极空间配置缺少name、host或cookie：{item}")
+                    continue
+                if any(config["name"] == name for config in configs):
+                    logger.error(f"多极空间名称重复：{name}")
+                    continue
+                configs.append({**item, "name": name, "concurrency": item.get("concurrency") or self._concurrency})
+        nodes = []
+        for config in configs:
+            host = str(config["host"])
+            if not host.startswith("http"):
+                host = "http://" + host
+            pathmapping = config.get("pathmapping") or ""
+            if isinstance(pathmapping, list):
+                pathmapping = "\n".join(str(line) for line in pathmapping)
+            if not isinstance(pathmapping, str):
+                logger.error(f"极空间{config['name']}目录映射配置错误，需要字符串或数组：{pathmapping}")
+                continue
+            try:
+                concurrency = max(int(config["concurrency"]), 1)
+            except (TypeError, ValueError):
+                logger.error(f"极空间{config['name']}并发刷新数配置错误，需要数字：{config['concurrency']}")
+                continue
+            nodes.append({
+                "name": config["name"],
+                "client": ZspaceClient(host.rstrip("/"), config["cookie"], pool_size=concurrency),
+                "concurrency": concurrency,
+                "startswith": config.get("startswith"),
+                "moivelib": config.get("moivelib"),
+                "tvlib": config.get("tvlib"),
+                "path_index": self.__build_path_index(pathmapping),
+                "path_prefixes": [line.split("#", 1)[0].strip() for line in pathmapping.splitlines()
+                                  if "#" in line and line.split("#", 1)[0].strip()],
+                # 极影视分类缓存 {"time": 获取时间, "data": 分类名 -> 分类ID}
+                "classify_cache": None
+            })
+        return nodes
+
+    @staticmethod
+    def __classify_key(name: str, classify: str) -> str:
+        """
+        分类在插件数据中的名称，默认极空间为分类名，其余极空间为 极空间名/分类名
+        """
+        return f"{name}/{classify}" if name else classify
+
+    @staticmethod
+    def __node_label(node: dict) -> str:
+        return f"极空间{node['name']}" if node["name"] else "极影视"
+
     def __update_config(self):
         self.update_config(
             {
@@ -131,152 +302,1099 @@ class ZspaceMediaFresh(_PluginBase):
                 "startswith":self._startswith,
                 "notify": self._notify,
                 "notifyaggregation":self._notifyaggregation,
-                "unit":self._unit
+                "unit":self._unit,
+                "concurrency": self._concurrency,
+                "pollmode": self._pollmode,
+                "pollinitial": self._pollinitial,
+                "pollmax": self._pollmax,
+                "eventrefresh": self._eventrefresh,
+                "debounce": self._debounce,
+                "cachettl": self._cachettl,
+                "pathmapping": self._pathmapping,
+                "engine": self._engine,
+                "maxduration": self._maxduration,
+                "zspnodes": self._zspnodes
             }
         )
 
-    def refresh(self):
+    def refresh(self, wait: bool = False, job: dict = None) -> Optional[bool]:
         """
         刷新极影视
+        :param wait: asyncio引擎下是否等待刷新完成
+        :param job: 远程命令、API提交的刷新任务，记录各分类的刷新进度
+        :return: 等待刷新完成时返回是否全部刷新成功，无需刷新时返回None
         """
-        classify_list = []
+        if not self._nodes:
+            logger.error(f"极空间地址或cookie未设置")
+            return
+        # 各极空间需要刷新的分类 极空间名 -> 分类名列表
+        plan = {}
+        latest = None
+        # 是否配置了网盘媒体库路径或目录映射
+        has_libs = any(node["startswith"] or node["path_index"] for node in self._nodes)
         if not self._flushall:
             # 参数验证
-            if not self._startswith:
+            if not has_libs:
                 logger.error(f"网盘媒体库路径未设置")
-                return           
+                return
+            # 只查询水位线之后的入库记录
+            watermark = self.get_data("watermark") or {}
+            inflight_watermark = self.__inflight_watermark(self.get_data("inflight") or [])
+            if inflight_watermark and inflight_watermark["id"] > (watermark.get("id") or 0):
+                # 刷新中(含重启后恢复中)的任务已包含的入库记录不重复处理，只有更新的入库记录才补充刷新
+                watermark = inflight_watermark
+            last_id = watermark.get("id") or 0
+            # 快速检查：水位线之后没有任何入库记录时直接返回
+            if self.__max_transfer_id() <= last_id:
+                logger.info(f"没有新的入库记录，跳过刷新极影视")
+                return
             #获取days内入库的媒体
-            current_date = datetime.now()
-            if self._unit =="day":
-                target_date = current_date - timedelta(days=int(self._timescope)) 
-            elif  self._unit =="hour":    
-                target_date = current_date - timedelta(hours=int(self._timescope)) 
-            elif  self._unit =="minute":
-                target_date = current_date - timedelta(minutes=int(self._timescope)) 
-            else:
+            target_date = self.__window_start()
+            if not target_date:
                  logger.info(f"时间范围单位未设置")
                  return
-            transferhistorys = TransferHistoryOper().list_by_date(target_date.strftime('%Y-%m-%d %H:%M:%S'))
-            if not transferhistorys:
-                logger.info(f"{self._timescope} {self._unit}内没有媒体库入库记录")
+            query_date = target_date
+            if watermark.get("date"):
+                # 同一秒内可能有多条记录，往前多查1秒再按ID过滤
+                watermark_date = datetime.strptime(watermark["date"], '%Y-%m-%d %H:%M:%S') - timedelta(seconds=1)
+                query_date = max(query_date, watermark_date)
+            query_date = query_date.strftime('%Y-%m-%d %H:%M:%S')
+            latest = self.__latest_transfer(query_date, last_id)
+            if not latest:
+                logger.info(f"{self._timescope} {self._unit}内没有新的媒体库入库记录")
                 return
-            #匹配指定路径的入库数据
-            filtered_transferhistorys = [th for th in transferhistorys if th.status == 1 and th.dest is not None and th.dest.startswith(self._startswith) ]
-            if  not filtered_transferhistorys :
-                logger.info(f"{self._timescope} {self._unit}内没有网盘媒体库的记录")
+            #匹配指定路径的入库数据，获取所在的分类
+            media_count, node_counts = self.__count_classify_media(query_date, last_id, latest[0])
+            if  not media_count :
+                logger.info(f"{self._timescope} {self._unit}内没有需要刷新的网盘媒体库的记录")
+                self.__save_watermark(latest)
                 return
-            # 提取顶级分类  电影或电视剧
-            unique_types = set([th.type for th in filtered_transferhistorys])
-            types_list =list(unique_types)
-            if "电影" in types_list:
-                moivelib_list = self._moivelib.replace("，", ",").split(",")
-            if "电视剧" in types_list:
-                tvlib_list = self._tvlib.replace("，", ",").split(",")
-            else:
-                tvlib_list = []
-            classify_list = moivelib_list + tvlib_list
-            logger.info(f"开始刷新极影视，最近{self._timescope} {self._unit}内网盘入库媒体：{len(filtered_transferhistorys)}个,需刷新媒体库：{classify_list}")
-        # 刷新极影视
-        self.__refresh_zspmedia(classify_list)
-        logger.info(f"刷新极影视完成")
+            # 新入库多的分类优先刷新
+            plan = {name: self.__sort_by_count(counts) for name, counts in node_counts.items()}
+            logger.info(f"开始刷新极影视，最近{self._timescope} {self._unit}内网盘入库媒体：{media_count}个,"
+                        f"需刷新媒体库：{self.__flat_counts(node_counts)}")
+        else:
+            # 刷新全部分类：有新入库的分类按入库数量优先刷新，其余分类随后刷新
+            node_counts = {}
+            target_date = self.__window_start()
+            if target_date and has_libs:
+                query_date = target_date.strftime('%Y-%m-%d %H:%M:%S')
+                rescanned = self.get_data("rescanned") or {}
+                if rescanned:
+                    # 所有分类最近一次刷新之前的入库都已刷新过，不再统计
+                    query_date = max(query_date, min(rescanned.values()))
+                _, node_counts = self.__count_classify_media(query_date, 0, self.__max_transfer_id())
+                if node_counts:
+                    logger.info(f"刷新全部分类，优先刷新有新入库的分类：{self.__flat_counts(node_counts)}")
+            plan = {node["name"]: self.__sort_by_count(node_counts.get(node["name"]) or {}) for node in self._nodes}
+        # 刷新极影视，刷新完成后推进水位线，失败时下次重新处理
+        return self.__dispatch_refresh(plan,
+                                       callback=(lambda: self.__save_watermark(latest)) if latest else None,
+                                       wait=wait,
+                                       watermark={"id": latest[0], "date": latest[1]} if latest else None,
+                                       job=job)
+
+    def __window_start(self) -> Optional[datetime]:
+        """
+        时间范围的开始时间
+        """
+        current_date = datetime.now()
+        if self._unit =="day":
+            return current_date - timedelta(days=int(self._timescope))
+        elif  self._unit =="hour":
+            return current_date - timedelta(hours=int(self._timescope))
+        elif  self._unit =="minute":
+            return current_date - timedelta(minutes=int(self._timescope))
+        return None
+
+    def __count_classify_media(self, query_date: str, last_id: int,
+                               max_id: int) -> Tuple[int, Dict[str, Dict[str, int]]]:
+        """
+        统计需要刷新的入库记录数量和各极空间各分类的入库数量 极空间名 -> 分类名 -> 数量
+        分类最近一次刷新开始之前入库的记录已被刷新过(如入库后刷新)，不再计入
+        """
+        rescanned = self.get_data("rescanned") or {}
+        media_count = 0
+        node_counts = {}
+        if len(self._nodes) == 1 and not self._nodes[0]["path_index"]:
+            # 只按媒体大类区分，数据库中直接统计各大类数量
+            records = [(self._nodes[0]["startswith"], mtype, count, date)
+                       for mtype, count, date in self.__count_transfer_types(query_date, last_id, max_id)]
+        else:
+            records = ((dest, mtype, 1, date) for dest, mtype, date in
+                       self.__iter_transfer_dests(query_date, last_id, max_id))
+        for dest, mtype, count, date in records:
+            matched = False
+            for node in self._nodes:
+                classifies = [c for c in self.__match_classify(node, dest, mtype)
+                              if date >= rescanned.get(self.__classify_key(node["name"], c), "")]
+                if not classifies:
+                    continue
+                matched = True
+                classify_counts = node_counts.setdefault(node["name"], {})
+                for classify in classifies:
+                    classify_counts[classify] = classify_counts.get(classify, 0) + count
+            if matched:
+                media_count += count
+        return media_count, node_counts
+
+    @staticmethod
+    def __sort_by_count(classify_counts: Dict[str, int]) -> List[str]:
+        """
+        按入库数量从多到少排序分类
+        """
+        return sorted(classify_counts, key=lambda c: -classify_counts[c])
+
+    def __flat_counts(self, node_counts: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+        return {self.__classify_key(name, classify): count
+                for name, classify_counts in node_counts.items() for classify, count in classify_counts.items()}
+
+    def __resume_refresh(self, inflight: List[dict]):
+        """
+        恢复重启前未完成的刷新：已提交的任务继续查询状态，未提交的分类重新提交
+        """
+        plan = {}
+        for record in inflight:
+            plan.setdefault(record.get("node") or "", []).append(record["classify"])
+        logger.info(f"恢复重启前未完成的极影视刷新："
+                    f"{[self.__classify_key(name, c) for name, classify_list in plan.items() for c in classify_list]}")
+        watermark = self.__inflight_watermark(inflight)
+        self.__dispatch_refresh(plan,
+                                callback=(lambda: self.__save_watermark((watermark["id"], watermark["date"])))
+                                if watermark else None,
+                                wait=False,
+                                watermark=watermark,
+                                resume=inflight)
+
+    @staticmethod
+    def __inflight_watermark(inflight: List[dict]) -> Optional[dict]:
+        """
+        未完成的刷新对应的最新入库记录水位线，任务结束或失败时记录随之删除
+        """
+        watermarks = [record["watermark"] for record in inflight if record.get("watermark")]
+        return max(watermarks, key=lambda w: w["id"]) if watermarks else None
+
+    def __dispatch_refresh(self, plan: Dict[str, List[str]], callback=None, wait: bool = True,
+                           watermark: dict = None, resume: List[dict] = None, job: dict = None) -> Optional[bool]:
+        """
+        按刷新引擎执行刷新，多个极空间并行刷新，全部刷新成功后执行回调
+        asyncio引擎提交到事件循环，不等待时立即返回，不占用定时任务线程
+        :param plan: 各极空间需要刷新的分类 极空间名 -> 分类名列表
+        :param watermark: 本次刷新对应的入库记录水位线，随未完成的任务保存
+        :param resume: 需要恢复的未完成任务
+        :param job: 刷新任务，记录各分类的刷新进度
+        :return: 等待刷新完成时返回是否全部刷新成功
+        """
+        nodes = [node for node in self._nodes if node["name"] in plan]
+        if self._engine == "asyncio" and self._loop:
+            future = asyncio.run_coroutine_threadsafe(
+                self.__async_refresh_nodes(nodes, plan, callback, watermark, resume, job), self._loop)
+            if not wait:
+                logger.info(f"极影视刷新已提交到asyncio刷新引擎")
+                return None
+            try:
+                return future.result()
+            except CancelledError:
+                logger.info(f"插件停止，极影视刷新已取消")
+            except Exception as e:
+                logger.error(f"极影视刷新出错：" + str(e))
+            return False
+        if len(nodes) > 1:
+            # 各极空间使用独立的线程并行刷新
+            with ThreadPoolExecutor(max_workers=len(nodes), thread_name_prefix="极影视刷新") as executor:
+                results = list(executor.map(
+                    lambda node: self.__refresh_zspmedia(node, plan[node["name"]], watermark, resume, job), nodes))
+        else:
+            results = [self.__refresh_zspmedia(node, plan[node["name"]], watermark, resume, job) for node in nodes]
+        return self.__finish_refresh(results, callback)
+
+    async def __async_refresh_nodes(self, nodes: List[dict], plan: Dict[str, List[str]], callback=None,
+                                    watermark: dict = None, resume: List[dict] = None, job: dict = None) -> bool:
+        """
+        asyncio引擎：各极空间在同一个事件循环中并行刷新
+        """
+        results = await asyncio.gather(*[self.__async_refresh_zspmedia(node, plan[node["name"]], watermark,
+                                                                       resume, job)
+                                         for node in nodes])
+        return await asyncio.get_running_loop().run_in_executor(None, self.__finish_refresh, list(results), callback)
+
+    def __finish_refresh(self, results: List[Tuple[str, bool]], callback=None) -> bool:
+        """
+        各极空间刷新结束，合并发送一条聚合通知，全部刷新成功后执行回调
+        :param results: 各极空间的 (聚合消息内容, 是否全部分类都刷新成功)
+        :return: 是否全部刷新成功
+        """
+        if self._event.is_set():
+            return False
+        self.__post_aggregation("".join(msgtext for msgtext, _ in results))
+        if all(success for _, success in results):
+            if callback:
+                callback()
+            logger.info(f"刷新极影视完成")
+            return True
+        logger.info(f"极影视有分类刷新失败，入库记录下次重新处理")
+        return False
+
+    def __match_classify(self, node: dict, dest: str, mtype: str) -> List[str]:
+        """
+        获取入库目录在极空间中所在的分类：优先按目录映射最长前缀匹配，否则按MP媒体大类匹配电影、电视剧分类
+        """
+        index = node["path_index"]
+        classifies = []
+        for part in self.__split_path(dest):
+            index = index.get(part)
+            if index is None:
+                break
+            classifies = index.get("#") or classifies
+        if classifies:
+            return classifies
+        if not node["startswith"] or not str(dest).startswith(node["startswith"]):
+            return []
+        if mtype == "电影" and node["moivelib"]:
+            return node["moivelib"].replace("，", ",").split(",")
+        if mtype == "电视剧" and node["tvlib"]:
+            return node["tvlib"].replace("，", ",").split(",")
+        return []
+
+    @staticmethod
+    def __build_path_index(pathmapping: str) -> dict:
+        """
+        解析目录映射，按路径层级构建前缀树，节点的 # 保存该目录对应的分类
+        每行格式：目录#分类名1,分类名2
+        """
+        index = {}
+        for line in (pathmapping or "").splitlines():
+            if "#" not in line:
+                continue
+            path, classifies = line.split("#", 1)
+            classifies = [c.strip() for c in classifies.replace("，", ",").split(",") if c.strip()]
+            parts = ZspaceMediaFresh.__split_path(path)
+            if not parts or not classifies:
+                continue
+            node = index
+            for part in parts:
+                node = node.setdefault(part, {})
+            node["#"] = classifies
+        return index
+
+    @staticmethod
+    def __split_path(path) -> List[str]:
+        return [part for part in str(path).replace("\\", "/").split("/") if part]
+
+    @eventmanager.register(EventType.TransferComplete)
+    def transfer_complete(self, event: Event):
+        """
+        入库完成后延迟刷新，静默期内的入库合并为一次刷新
+        """
+        if not self._enabled or not self._eventrefresh or not self._scheduler:
+            return
+        if self._flushall:
+            return
+        event_data = event.event_data or {}
+        transferinfo = event_data.get("transferinfo")
+        mediainfo = event_data.get("mediainfo")
+        if not transferinfo or not mediainfo or not getattr(transferinfo, "success", True):
+            return
+        # v1为target_path，v2为target_diritem
+        target_path = getattr(transferinfo, "target_path", None) \
+            or getattr(getattr(transferinfo, "target_diritem", None), "path", None)
+        if not target_path or not any(self.__match_classify(node, str(target_path), mediainfo.type.value)
+                                      for node in self._nodes):
+            return
+        with self._pending_lock:
+            self._pending_dests[str(target_path)] = mediainfo.type.value
+            logger.info(f"网盘媒体库入库：{target_path}，{self._debounce}秒内无新入库后刷新极影视")
+            # 重置静默期计时
+            self._scheduler.add_job(self.__refresh_pending, 'date',
+                                    run_date=datetime.now(
+                                        tz=pytz.timezone(settings.TZ)) + timedelta(seconds=int(self._debounce)),
+                                    id="zspacemediafresh_debounce",
+                                    replace_existing=True,
+                                    name="极影视入库刷新")
+            if not self._scheduler.running:
+                self._scheduler.start()
+
+    def __refresh_pending(self):
+        """
+        刷新入库事件涉及的分类
+        """
+        with self._pending_lock:
+            pending_dests = self._pending_dests
+            self._pending_dests = {}
+        if not pending_dests:
+            return
+        node_counts = {}
+        for dest, mtype in pending_dests.items():
+            for node in self._nodes:
+                for classify in self.__match_classify(node, dest, mtype):
+                    classify_counts = node_counts.setdefault(node["name"], {})
+                    classify_counts[classify] = classify_counts.get(classify, 0) + 1
+        logger.info(f"开始刷新极影视，网盘入库媒体：{len(pending_dests)}个,需刷新媒体库：{self.__flat_counts(node_counts)}")
+        # 新入库多的分类优先刷新
+        self.__dispatch_refresh({name: self.__sort_by_count(counts) for name, counts in node_counts.items()},
+                                wait=False)
+
+    def __save_watermark(self, latest: Tuple[int, str]):
+        """
+        记录已处理的最新入库记录，水位线只前进不后退
+        """
+        watermark = self.get_data("watermark") or {}
+        if (watermark.get("id") or 0) >= latest[0]:
+            return
+        self.save_data("watermark", {"id": latest[0], "date": latest[1]})
+        logger.debug(f"极影视刷新水位线更新：{latest[0]} {latest[1]}")
+
+    @staticmethod
+    def __max_transfer_id() -> int:
+        """
+        最新的入库记录ID
+        """
+        with SessionFactory() as db:
+            return db.query(func.max(TransferHistory.id)).scalar() or 0
+
+    @staticmethod
+    def __latest_transfer(query_date: str, last_id: int) -> Optional[Tuple[int, str]]:
+        """
+        水位线之后最新的一条入库记录 (id, date)
+        """
+        with SessionFactory() as db:
+            latest = db.query(TransferHistory.id, TransferHistory.date) \
+                .filter(TransferHistory.id > last_id, TransferHistory.date > query_date) \
+                .order_by(TransferHistory.id.desc()).first()
+            return tuple(latest) if latest else None
+
+    def __transfer_filters(self, query_date: str, last_id: int, max_id: int) -> list:
+        """
+        入库成功且在网盘媒体库路径、目录映射下的记录
+        """
+        prefixes = [prefix for node in self._nodes for prefix in [node["startswith"]] + node["path_prefixes"] if prefix]
+        return [TransferHistory.id > last_id,
+                TransferHistory.id <= max_id,
+                TransferHistory.date > query_date,
+                TransferHistory.status == 1,
+                TransferHistory.dest.isnot(None),
+                or_(*[TransferHistory.dest.startswith(prefix, autoescape=True) for prefix in prefixes])]
+
+    def __count_transfer_types(self, query_date: str, last_id: int, max_id: int) -> List[Tuple[str, int, str]]:
+        """
+        按媒体大类统计入库数量和最近入库时间
+        """
+        with SessionFactory() as db:
+            return [(mtype, count, date) for mtype, count, date in
+                    db.query(TransferHistory.type, func.count(TransferHistory.id), func.max(TransferHistory.date))
+                    .filter(*self.__transfer_filters(query_date, last_id, max_id))
+                    .group_by(TransferHistory.type).all()]
+
+    def __iter_transfer_dests(self, query_date: str, last_id: int, max_id: int, page_size: int = 500):
+        """
+        按ID分页读取入库记录的 (dest, type, date)，避免一次加载全部历史记录
+        """
+        filters = self.__transfer_filters(query_date, last_id, max_id)
+        cursor = last_id
+        with SessionFactory() as db:
+            while True:
+                rows = db.query(TransferHistory.id, TransferHistory.dest, TransferHistory.type, TransferHistory.date) \
+                    .filter(*filters, TransferHistory.id > cursor) \
+                    .order_by(TransferHistory.id).limit(page_size).all()
+                for _, dest, mtype, date in rows:
+                    yield dest, mtype, date
+                if len(rows) < page_size:
+                    break
+                cursor = rows[-1][0]
 
     @eventmanager.register(EventType.PluginAction)
     def remote_sync(self, event: Event):
         """
-        远程刷新媒体库
+        远程刷新媒体库，提交刷新任务后立即回复任务ID，不阻塞事件处理
         """
         if event:
             event_data = event.event_data
             if not event_data or event_data.get("action") != "zsp_media_refresh":
                 return
-            self.post_message(channel=event.event_data.get("channel"),
-                              title="开始刷新极影视 ...",
-                              userid=event.event_data.get("user"))
-        self.refresh()
-        if event:
-            self.post_message(channel=event.event_data.get("channel"),
-                              title="刷新极影视完成！", userid=event.event_data.get("user"))
+        channel = event.event_data.get("channel") if event else None
+        userid = event.event_data.get("user") if event else None
+        job = self.__submit_job("命令", channel=channel, userid=userid)
+        if not job:
+            self.post_message(channel=channel, title="极空间地址或cookie未设置，无法刷新极影视", userid=userid)
+            return
+        self.post_message(channel=channel, title="开始刷新极影视 ...",
+                          text=f"任务ID：{job['id']}", userid=userid)
 
-    def __refresh_zspmedia(self,classify_list):
+    def __submit_job(self, source: str, channel=None, userid=None) -> Optional[dict]:
         """
-        刷新极影视
+        提交刷新任务到任务队列，返回任务信息
+        """
+        if not self._nodes or not self._job_executor:
+            logger.error(f"极空间地址或cookie未设置")
+            return None
+        job = {
+            "id": uuid.uuid4().hex[:8],
+            "source": source,
+            # 排队中、刷新中、完成、失败、无需刷新、已取消
+            "status": "排队中",
+            "create_time": time.time(),
+            "start_time": None,
+            "end_time": None,
+            # 需要刷新的分类
+            "classifies": [],
+            # 各分类刷新进度 分类名 -> 进度
+            "progress": {},
+            "channel": channel,
+            "userid": userid
+        }
+        with self._jobs_lock:
+            self._jobs[job["id"]] = job
+            # 只保留最近的已结束任务
+            finished = [job_id for job_id, item in self._jobs.items() if item["end_time"]]
+            for job_id in finished[:max(len(self._jobs) - self._job_limit, 0)]:
+                self._jobs.pop(job_id)
+        try:
+            self._job_executor.submit(self.__run_job, job)
+        except RuntimeError:
+            # 插件停止中，任务队列已关闭
+            job["status"], job["end_time"] = "已取消", time.time()
+        logger.info(f"极影视刷新任务已提交，任务ID：{job['id']}，来源：{source}")
+        return job
+
+    def __run_job(self, job: dict):
+        """
+        执行刷新任务，刷新完成后回复提交命令的用户
+        """
+        if self._event.is_set():
+            job["status"], job["end_time"] = "已取消", time.time()
+            return
+        job["status"], job["start_time"] = "刷新中", time.time()
+        try:
+            result = self.refresh(wait=True, job=job)
+        except Exception as e:
+            logger.error(f"极影视刷新任务{job['id']}出错：" + str(e))
+            result = False
+        if self._event.is_set():
+            job["status"] = "已取消"
+        else:
+            job["status"] = "无需刷新" if result is None else ("完成" if result else "失败")
+        job["end_time"] = time.time()
+        logger.info(f"极影视刷新任务{job['id']}结束：{job['status']}")
+        if job["source"] == "命令":
+            self.post_message(channel=job["channel"],
+                              title=f"刷新极影视{job['status']}！" if job["status"] != "无需刷新" else "没有需要刷新的极影视分类",
+                              text=f"任务ID：{job['id']}", userid=job["userid"])
+
+    def __job_classifies(self, job: Optional[dict], node: dict, classify_list: List[str]):
+        """
+        记录刷新任务需要刷新的分类，刷新全部分类时获取分类列表后才能确定
+        """
+        if not job:
+            return
+        with self._jobs_lock:
+            for classify in classify_list:
+                key = self.__classify_key(node["name"], classify)
+                if key not in job["classifies"]:
+                    job["classifies"].append(key)
+
+    def __job_progress(self, job: Optional[dict], key: str, status: str, task: dict = None, end_time: float = None):
+        """
+        更新刷新任务中分类的刷新进度
+        """
+        if not job:
+            return
+        progress = {"status": status}
+        if task:
+            progress.update({
+                "task_id": task["task_id"],
+                "start_time": task["start_time"],
+                "end_time": end_time,
+                "polls": task["polls"],
+                "estimate": task.get("estimate")
+            })
+        with self._jobs_lock:
+            job["progress"][key] = progress
+
+    def __job_info(self, job: dict, detail: bool = False) -> dict:
+        """
+        刷新任务信息，detail时包含各分类的刷新进度
+        """
+        now = time.time()
+        # 刷新线程同时在更新进度，取快照后再读取
+        with self._jobs_lock:
+            classifies = list(job["classifies"])
+            job_progress = dict(job["progress"])
+
+        def format_time(value):
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(value)) if value else None
+
+        info = {
+            "id": job["id"],
+            "source": job["source"],
+            "status": job["status"],
+            "create_time": format_time(job["create_time"]),
+            "start_time": format_time(job["start_time"]),
+            "end_time": format_time(job["end_time"]),
+            "classifies": len(classifies),
+            "finished": len([p for p in job_progress.values() if p["status"] not in ["刷新中"]])
+        }
+        if detail:
+            progress = {}
+            for key in classifies:
+                item = dict(job_progress.get(key) or {"status": "等待刷新"})
+                if item.get("start_time"):
+                    # 刷新中的分类为已刷新时间，结束的分类为刷新耗时
+                    end_time = item.pop("end_time", None) or now
+                    item["elapsed"] = round(end_time - item["start_time"], 1)
+                    item["start_time"] = format_time(item["start_time"])
+                progress[key] = item
+            info["progress"] = progress
+        return info
+
+    def __refresh_zspmedia(self, node: dict, classify_list, watermark: dict = None,
+                           resume: List[dict] = None, job: dict = None) -> Tuple[str, bool]:
+        """
+        刷新极空间的极影视，返回聚合消息内容和是否全部分类都刷新成功
+        有分类提交失败、超时或中断时不算刷新成功，不推进水位线
         """
-        if not self._zsphost or not self._zspcookie:
-            return False
-        cookie = RequestUtils.cookie_parse(self._zspcookie)
-        token = cookie['token']
-        device_id = cookie['device_id']
-        msgtext= None
         total_msgtext = ""
-        # 获取分类列表
-        list_url = "%s/zvideo/classification/list?&rnd=%s&webagent=v2" % (self._zsphost, self.generate_string() )
+        # 本次刷新占用的分类
+        owned = set()
+        # 是否有分类提交失败或超时
+        failed = False
         try:
-            rsp_body=RequestUtils(cookies=self._zspcookie).post_res(list_url)
-            res = rsp_body.json()
-            logger.debug(f"获取极影视分类 ：{res}")
-            if res and res["code"] == "200":
-                if res["data"] and isinstance(res["data"], list):
-                    # 获取分类ID
-                    name_id_dict = {item["name"]: item["id"] for item in res['data']}
-                    # 是否全类型刷新
-                    if self._flushall :
-                            classify_list = [item["name"] for item in res['data']]
-                    for classify in classify_list:
-                        if classify not in name_id_dict:
-                            logger.info(f"分类 {classify} 不存在于极影视分类列表中，跳过刷新")
+            prepared = self.__prepare_resume(node, resume) if resume else self.__prepare_refresh(node, classify_list)
+            if not prepared:
+                return total_msgtext, False
+            name_id_dict, pending, waits = prepared
+            owned.update(pending)
+            self.__job_classifies(job, node, pending)
+            concurrency = node["concurrency"]
+            # 刷新中的任务 task_id -> 任务信息
+            running = {}
+            for task in self.__resume_tasks(node, resume, pending):
+                running[task["task_id"]] = task
+            self.__save_inflight(node, pending, name_id_dict, watermark)
+            total_polls = 0
+            while (pending or running) and not self._event.is_set():
+                # 按并发上限提交刷新请求
+                while pending and len(running) < concurrency:
+                    classify = pending.pop(0)
+                    task = self.__submit_rescan(node, classify, name_id_dict[classify], watermark, job)
+                    if task:
+                        running[task["task_id"]] = task
+                    else:
+                        failed = True
+                        self.__release_classify(node, classify, followup=False, failed=True)
+                        owned.discard(classify)
+                if not running:
+                    continue
+                # 轮询到期的任务
+                finished = False
+                for task_id, task in list(running.items()):
+                    if task["next_poll"] > time.time():
+                        continue
+                    task_status = self.__query_rescan(task)
+                    if task_status in [4, None]:
+                        # 刷新中或查询失败，未超时继续查询
+                        task["timeout"] = self.__check_timeout(task)
+                        if not task["timeout"]:
+                            task["next_poll"] = self.__next_poll_time(task)
                             continue
-                        # 提交刷新请求
-                        rescan_url = "%s/zvideo/classification/rescan?&rnd=%s&webagent=v2" % (self._zsphost, self.generate_string())
-                        formdata = {"classification_id": name_id_dict[classify],"device_id":device_id,"token":token,"device":"PC电脑","plat":"web"}
-                        rescanres = RequestUtils(headers={"Content-Type": "application/x-www-form-urlencoded"},cookies=self._zspcookie).post_res(rescan_url,formdata)
-                        rescanres_json = rescanres.json()
-                        logger.debug(f"提交刷新请求--rescanres_json：{rescanres_json}")
-                        start_time = time.time()# 记录开始时间
-                        if rescanres_json["code"] =="200" and rescanres_json["data"]["task_id"]:
-                            logger.info(f"分类：{classify}开始刷新，任务ID：{rescanres_json['data']['task_id']}")
-                            # 查询刷新结果
-                            result_url = "%s/zvideo/classification/rescan/result?&rnd=%s&webagent=v2" % (self._zsphost,self.generate_string())
-                            formdata["task_id"] = rescanres_json['data']['task_id']
-                            logger.debug(f"返回数据-----》：{formdata}")
+                    running.pop(task_id)
+                    finished = True
+                    total_polls += task["polls"]
+                    msgtext = self.__finish_rescan(task, task_status)
+                    if task["timeout"]:
+                        failed = True
+                    if self._notifyaggregation and self._notify:
+                        total_msgtext += msgtext
+                    if self.__release_classify(node, task["classify"], failed=bool(task["timeout"])):
+                        logger.info(f"分类：{task['key']} 刷新期间有新的刷新请求，补充刷新一次")
+                        pending.append(task["classify"])
+                        self.__save_inflight(node, [task["classify"]], name_id_dict, watermark)
+                    else:
+                        owned.discard(task["classify"])
+                # 有任务结束且还有待提交的分类时立即补位，否则等待最近一个任务的查询时间
+                if running and not (finished and pending):
+                    wait = max(min(t["next_poll"] for t in running.values()) - time.time(), 0)
+                    if wait:
+                        logger.info(f"刷新执行中的分类：{[t['key'] for t in running.values()]}，等待{wait:.1f}秒")
+                        self._event.wait(wait)  #任务状态进行中 等待，插件停止时立即退出
+            if self._event.is_set():
+                logger.info(f"插件停止，{self.__node_label(node)}刷新中断，{len(running)}个刷新中的任务下次启动后继续查询")
+                return total_msgtext, False
+            logger.info(f"{self.__node_label(node)}分类刷新结束，共查询刷新状态{total_polls}次")
+            # 等待其他任务中的分类刷新完成，其他任务刷新失败时本次也不算成功
+            for event in waits:
+                if not self.__wait_flight(event):
+                    failed = True
+            return total_msgtext, not failed
+        except Exception as e:
+            logger.error(f"{self.__node_label(node)}刷新出错：" + str(e))
+            return total_msgtext, False
+        finally:
+            for classify in owned:
+                # 异常结束时删除未完成记录，避免下次启动恢复后按本次水位线跳过未刷新的入库记录；插件停止时保留以便恢复
+                if not self._event.is_set():
+                    self.__remove_inflight(self.__classify_key(node["name"], classify))
+                self.__release_classify(node, classify, followup=False, failed=True)
+
+    async def __async_refresh_zspmedia(self, node: dict, classify_list, watermark: dict = None,
+                                       resume: List[dict] = None, job: dict = None) -> Tuple[str, bool]:
+        """
+        刷新极空间的极影视，asyncio引擎：所有分类的状态查询在同一个事件循环中等待，不占用线程
+        返回聚合消息内容和是否全部分类都刷新成功
+        """
+        loop = asyncio.get_running_loop()
+        # 本次刷新占用的分类
+        owned = set()
+        # 按完成顺序记录 (消息内容, 查询次数)
+        results = []
+        # 提交失败或超时的分类
+        failures = []
+
+        def total_msgtext():
+            return "".join(msgtext for msgtext, _ in results)
+
+        try:
+            if resume:
+                prepared = self.__prepare_resume(node, resume)
+            else:
+                prepared = await loop.run_in_executor(None, self.__prepare_refresh, node, classify_list)
+            if not prepared:
+                return "", False
+            name_id_dict, pending, waits = prepared
+            owned.update(pending)
+            self.__job_classifies(job, node, pending)
+            resumed = {task["classify"]: task for task in self.__resume_tasks(node, resume, pending)}
+            await loop.run_in_executor(None, self.__save_inflight, node, pending, name_id_dict, watermark)
+            semaphore = asyncio.Semaphore(node["concurrency"])
+
+            async def rescan(classify, task=None):
+                while True:
+                    async with semaphore:
+                        if not task:
+                            task = await loop.run_in_executor(None, self.__submit_rescan, node, classify,
+                                                              name_id_dict[classify], watermark, job)
+                        if task:
                             while True:
-                                #轮询状态
-                                resultRep = RequestUtils(headers={"Content-Type": "application/x-www-form-urlencoded"},
-                                                        cookies=self._zspcookie).post_res(result_url, formdata)
-                                result_json = resultRep.json()
-                                if result_json and result_json["code"] in ["200","N120024"] and result_json["data"]["task_status"] == 4:
-                                    logger.info(f"分类：{classify} 刷新执行中,等待{self._waittime}秒，task_id：{rescanres_json['data']['task_id']}")
-                                    time.sleep(int(self._waittime))  #任务状态进行中 等待
-                                else:
-                                    logger.info(f"分类：{classify} 刷新任务执行结束,task_id：{rescanres_json['data']['task_id']}，task_status:{result_json['data']['task_status']}")
-                                    end_time = time.time()  # 记录结束时间
-                                    msgtext =f"分类：{classify} 刷新成功\n"+f"开始时间： {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}\n"+f"用时： {int(end_time - start_time)} 秒\n"
-                                    if not self._notifyaggregation and self._notify:
-                                        self.post_message(
-                                            mtype=NotificationType.Plugin,
-                                            title="【刷新极影视】",
-                                            text= msgtext)
-                                    elif self._notifyaggregation and self._notify :
-                                        total_msgtext += msgtext
+                                await asyncio.sleep(max(task["next_poll"] - time.time(), 0))
+                                task_status = await loop.run_in_executor(None, self.__query_rescan, task)
+                                if task_status not in [4, None]:
                                     break
+                                # 刷新中或查询失败，未超时继续查询
+                                task["timeout"] = self.__check_timeout(task)
+                                if task["timeout"]:
+                                    break
+                                task["next_poll"] = self.__next_poll_time(task)
+                            msgtext = await loop.run_in_executor(None, self.__finish_rescan, task, task_status)
+                            results.append((msgtext, task["polls"]))
+                            if task["timeout"]:
+                                failures.append(classify)
                         else:
-                            logger.info(f"极影视获取分类列表出错：{rescanres_json}")
-                    if  self._notifyaggregation and self._notify:
-                        self.post_message(
-                                mtype=NotificationType.Plugin,
-                                title="【刷新极影视】",
-                                text=total_msgtext)
-            else:
-                logger.info(f"极影视获取分类列表出错：{res}")
+                            # 提交失败，不再补充刷新
+                            failures.append(classify)
+                            self.__release_classify(node, classify, followup=False, failed=True)
+                            owned.discard(classify)
+                            return
+                    timeout = bool(task["timeout"])
+                    task = None
+                    if not self.__release_classify(node, classify, failed=timeout):
+                        owned.discard(classify)
+                        return
+                    logger.info(f"分类：{self.__classify_key(node['name'], classify)} 刷新期间有新的刷新请求，补充刷新一次")
+                    await loop.run_in_executor(None, self.__save_inflight, node, [classify], name_id_dict, watermark)
+
+            # 恢复的任务已在极空间刷新中，优先占用并发数
+            await asyncio.gather(*[rescan(classify, task) for classify, task in resumed.items()]
+                                 + [rescan(classify) for classify in pending])
+            logger.info(f"{self.__node_label(node)}分类刷新结束，共查询刷新状态{sum(polls for _, polls in results)}次")
+            # 等待其他任务中的分类刷新完成，其他任务刷新失败时本次也不算成功
+            for event in waits:
+                if not await loop.run_in_executor(None, self.__wait_flight, event):
+                    failures.append(None)
+            return total_msgtext(), not failures
         except Exception as e:
-            logger.error(f"极影视刷新出错：" + str(e))
+            logger.error(f"{self.__node_label(node)}刷新出错：" + str(e))
+            return total_msgtext(), False
+        finally:
+            for classify in owned:
+                # 异常结束时删除未完成记录，避免下次启动恢复后按本次水位线跳过未刷新的入库记录；插件停止时保留以便恢复
+                if not self._event.is_set():
+                    self.__remove_inflight(self.__classify_key(node["name"], classify))
+                self.__release_classify(node, classify, followup=False, failed=True)
+
+    def __wait_flight(self, event: ThreadEvent) -> bool:
+        """
+        等待其他任务中的分类刷新完成，返回是否刷新成功，插件停止时立即返回False
+        """
+        while not event.wait(1):
+            if self._event.is_set():
+                return False
+        return not getattr(event, "failed", False)
+
+    def __save_inflight(self, node: dict, classify_list: List[str], name_id_dict: Dict[str, Any],
+                        watermark: dict = None, task: dict = None):
+        """
+        保存未完成的分类，已提交的记录任务ID，重启后恢复
+        """
+        if not classify_list:
+            return
+        with self._data_lock:
+            inflight = {self.__classify_key(item.get("node") or "", item["classify"]): item
+                        for item in self.get_data("inflight") or []}
+            for classify in classify_list:
+                inflight[self.__classify_key(node["name"], classify)] = {
+                    "node": node["name"],
+                    "classify": classify,
+                    "classification_id": name_id_dict[classify],
+                    "task_id": task["task_id"] if task else None,
+                    "start_time": task["start_time"] if task else None,
+                    "watermark": watermark
+                }
+            self.save_data("inflight", list(inflight.values()))
+
+    def __remove_inflight(self, key: str):
+        """
+        分类刷新结束，删除未完成记录
+        """
+        with self._data_lock:
+            inflight = self.get_data("inflight") or []
+            remains = [item for item in inflight
+                       if self.__classify_key(item.get("node") or "", item["classify"]) != key]
+            if len(remains) != len(inflight):
+                self.save_data("inflight", remains)
+
+    def __prepare_resume(self, node: dict, resume: List[dict]) -> Tuple[Dict[str, Any], List[str], list]:
+        """
+        占用极空间需要恢复的分类，分类ID使用保存的记录，不请求分类列表
+        """
+        name_id_dict = {record["classify"]: record["classification_id"] for record in resume
+                        if (record.get("node") or "") == node["name"]}
+        pending, waits = self.__claim_classify(node, list(name_id_dict.keys()))
+        return name_id_dict, pending, waits
+
+    def __resume_tasks(self, node: dict, resume: Optional[List[dict]], pending: List[str]) -> List[dict]:
+        """
+        重建重启前已提交的任务，从待提交的分类中移除，继续查询状态
+        """
+        tasks = []
+        for record in resume or []:
+            if (record.get("node") or "") != node["name"] \
+                    or not record.get("task_id") or record["classify"] not in pending:
+                continue
+            pending.remove(record["classify"])
+            logger.info(f"分类：{self.__classify_key(node['name'], record['classify'])} "
+                        f"继续查询重启前的刷新任务，任务ID：{record['task_id']}")
+            tasks.append(self.__new_task(node, record["classify"], record["classification_id"],
+                                         record["task_id"], record["start_time"] or time.time()))
+        return tasks
+
+    @staticmethod
+    async def __shutdown_loop():
+        """
+        取消事件循环中的所有任务并停止事件循环
+        """
+        current = asyncio.current_task()
+        tasks = [task for task in asyncio.all_tasks() if task is not current]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.get_running_loop().call_soon(asyncio.get_running_loop().stop)
+
+    def __prepare_refresh(self, node: dict, classify_list) -> Optional[Tuple[Dict[str, Any], List[str], list]]:
+        """
+        获取分类ID并占用需要刷新的分类，返回分类ID、本次需要提交的分类和需等待的其他刷新任务
+        """
+        # 获取分类ID
+        name_id_dict = self.__get_classifications(node)
+        if not name_id_dict:
+            return None
+        # 缓存中找不到分类名时，可能是极影视新增了分类，重新获取
+        if not self._flushall and any(classify not in name_id_dict for classify in classify_list):
+            name_id_dict = self.__get_classifications(node, force=True) or name_id_dict
+        # 是否全类型刷新，已排序的分类在前
+        if self._flushall :
+                classify_list = [c for c in classify_list if c in name_id_dict] \
+                                + [c for c in name_id_dict.keys() if c not in classify_list]
+        # 待提交的分类
+        pending = []
+        for classify in classify_list:
+            if classify not in name_id_dict:
+                logger.info(f"分类 {classify} 不存在于{self.__node_label(node)}分类列表中，跳过刷新")
+                continue
+            if classify not in pending:
+                pending.append(classify)
+        # 正在被其他任务刷新的分类不重复提交，合并为其结束后的一次补充刷新
+        pending, waits = self.__claim_classify(node, pending)
+        return name_id_dict, pending, waits
+
+    def __post_aggregation(self, total_msgtext: str):
+        """
+        发送聚合通知
+        """
+        if  self._notifyaggregation and self._notify and total_msgtext:
+            self.post_message(
+                    mtype=NotificationType.Plugin,
+                    title="【刷新极影视】",
+                    text=total_msgtext)
+
+    def __claim_classify(self, node: dict, classify_list: List[str]) -> Tuple[List[str], list]:
+        """
+        占用需要刷新的分类，返回本次需要提交的分类以及需等待的其他刷新任务
+        """
+        owned = []
+        waits = []
+        with self._flight_lock:
+            for classify in classify_list:
+                key = self.__classify_key(node["name"], classify)
+                if key in self._flight_classify:
+                    logger.info(f"分类：{key} 正在刷新中，结束后补充刷新一次")
+                    self._followup_classify.add(key)
+                    waits.append(self._flight_classify[key])
+                else:
+                    self._flight_classify[key] = ThreadEvent()
+                    owned.append(classify)
+        return owned, waits
+
+    def __release_classify(self, node: dict, classify: str, followup: bool = True, failed: bool = False) -> bool:
+        """
+        分类刷新结束，刷新期间有新的请求时保持占用并返回True，由当前任务补充刷新
+        :param failed: 刷新是否失败，通知等待该分类的其他任务
+        """
+        key = self.__classify_key(node["name"], classify)
+        with self._flight_lock:
+            if followup and key in self._followup_classify:
+                self._followup_classify.discard(key)
+                return True
+            self._followup_classify.discard(key)
+            event = self._flight_classify.pop(key, None)
+            if event:
+                event.failed = failed
+                event.set()
             return False
-        return False
+
+    def __get_classifications(self, node: dict, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        获取极影视分类 分类名 -> 分类ID，缓存有效期内不重复请求
+        """
+        cache = node["classify_cache"]
+        if not force and cache and time.time() - cache["time"] < float(self._cachettl) * 60:
+            return cache["data"]
+        res = node["client"].post("/zvideo/classification/list")
+        logger.debug(f"获取{self.__node_label(node)}分类 ：{res}")
+        if not res or res["code"] != "200":
+            logger.info(f"{self.__node_label(node)}获取分类列表出错：{res}")
+            return None
+        if not res["data"] or not isinstance(res["data"], list):
+            return {}
+        name_id_dict = {item["name"]: item["id"] for item in res['data']}
+        node["classify_cache"] = {"time": time.time(), "data": name_id_dict}
+        return name_id_dict
+
+    def __submit_rescan(self, node: dict, classify, classification_id, watermark: dict = None,
+                        job: dict = None) -> Optional[dict]:
+        """
+        提交分类刷新请求，返回任务信息
+        """
+        client = node["client"]
+        key = self.__classify_key(node["name"], classify)
+        formdata = {"classification_id": classification_id,"device_id":client.device_id,"token":client.token,"device":"PC电脑","plat":"web"}
+        rescanres_json = client.post("/zvideo/classification/rescan", formdata)
+        logger.debug(f"提交刷新请求--rescanres_json：{rescanres_json}")
+        if isinstance(rescanres_json, dict) and rescanres_json.get("code") == "200" \
+                and isinstance(rescanres_json.get("data"), dict) and rescanres_json["data"].get("task_id"):
+            logger.info(f"分类：{key}开始刷新，任务ID：{rescanres_json['data']['task_id']}")
+            task = self.__new_task(node, classify, classification_id, rescanres_json['data']['task_id'], time.time())
+            task["job"] = job
+            self.__save_inflight(node, [classify], {classify: classification_id}, watermark, task)
+            self.__job_progress(job, key, "刷新中", task)
+            return task
+        logger.info(f"分类：{key} 提交刷新出错：{rescanres_json}")
+        self.__job_progress(job, key, "提交失败")
+        self.__remove_inflight(key)
+        # 分类可能已被删除，下次重新获取分类列表
+        node["classify_cache"] = None
+        return None
+
+    def __new_task(self, node: dict, classify: str, classification_id, task_id, start_time: float) -> dict:
+        """
+        刷新任务信息
+        """
+        client = node["client"]
+        key = self.__classify_key(node["name"], classify)
+        formdata = {"classification_id": classification_id, "device_id": client.device_id,
+                    "token": client.token, "device": "PC电脑", "plat": "web", "task_id": task_id}
+        estimate = (self.get_data("estimates") or {}).get(key)
+        max_duration = self.__max_duration(estimate)
+        # 首次查询时间，重启后恢复的任务已过时间的立即查询
+        next_poll = max(start_time + self.__first_poll_delay(estimate), time.time())
+        if max_duration > 0:
+            next_poll = min(next_poll, start_time + max_duration * 60)
+        return {
+            "node": node,
+            "classify": classify,
+            # 插件数据、日志和通知中的分类名
+            "key": key,
+            "task_id": task_id,
+            "formdata": formdata,
+            "start_time": start_time,
+            "polls": 0,
+            # 连续查询失败次数
+            "failures": 0,
+            # 超时原因
+            "timeout": None,
+            "prev_poll": None,
+            "last_poll": None,
+            # 分类预计刷新耗时
+            "estimate": estimate,
+            # 最长刷新时间(分钟)，0为不限制
+            "max_duration": max_duration,
+            "next_poll": next_poll
+        }
+
+    def __max_duration(self, estimate: Optional[float] = None) -> float:
+        """
+        分类的最长刷新时间(分钟)，0为不限制
+        未配置时取预计耗时的倍数，不低于下限，避免扫描卡住时一直等待
+        """
+        if self._maxduration not in [None, ""]:
+            return float(self._maxduration)
+        return round(max(self._timeout_factor * (estimate or 0) / 60, self._timeout_floor), 1)
+
+    def __query_rescan(self, task: dict) -> Optional[int]:
+        """
+        查询分类刷新状态，4为刷新中
+        """
+        result_json = task["node"]["client"].post("/zvideo/classification/rescan/result", task["formdata"])
+        task["polls"] += 1
+        task["prev_poll"], task["last_poll"] = task["last_poll"], time.time()
+        self.__job_progress(task.get("job"), task["key"], "刷新中", task)
+        logger.debug(f"分类：{task['key']} 刷新状态：{result_json}")
+        if result_json and result_json["code"] in ["200","N120024"] and result_json.get("data"):
+            task["failures"] = 0
+            return result_json["data"].get("task_status")
+        task["failures"] += 1
+        logger.info(f"分类：{task['key']} 查询刷新状态失败{task['failures']}次：{result_json}")
+        return None
+
+    def __check_timeout(self, task: dict) -> Optional[str]:
+        """
+        检查未结束的任务是否超时或停滞，返回原因
+        """
+        if task["failures"] >= self._stall_failures:
+            return f"连续{task['failures']}次查询刷新状态失败"
+        if task["max_duration"] > 0 and time.time() - task["start_time"] >= task["max_duration"] * 60:
+            return f"超过最长刷新时间{task['max_duration']:g}分钟"
+        return None
+
+    def __next_poll_time(self, task: dict) -> float:
+        """
+        下一次查询状态的时间，不晚于最长刷新时间
+        """
+        next_poll = time.time() + self.__next_poll_delay(task)
+        if task["max_duration"] > 0:
+            next_poll = min(next_poll, task["start_time"] + task["max_duration"] * 60)
+        return next_poll
+
+    def __first_poll_delay(self, estimate: Optional[float] = None) -> float:
+        """
+        提交刷新后首次查询状态的等待时间，有预计耗时的分类在预计完成前稍早查询
+        """
+        if estimate:
+            return estimate * 0.9
+        if self._pollmode == "backoff":
+            return float(self._pollinitial)
+        # 固定间隔：提交后立即查询一次
+        return 0
+
+    def __next_poll_delay(self, task: dict) -> float:
+        """
+        任务仍在刷新中，计算下一次查询状态的等待时间
+        固定间隔：等待时间；指数退避：首次间隔按2倍递增，加入±20%抖动，不超过间隔上限
+        按预计耗时首次查询的任务已接近完成，从首次间隔重新开始退避
+        """
+        if self._pollmode != "backoff":
+            return int(self._waittime)
+        exponent = task["polls"] - 1 if task.get("estimate") else task["polls"]
+        delay = float(self._pollinitial) * (2 ** max(exponent, 0)) * random.uniform(0.8, 1.2)
+        return min(delay, float(self._pollmax))
+
+    def __finish_rescan(self, task: dict, task_status: Optional[int]) -> str:
+        """
+        分类刷新结束，发送通知并返回消息内容
+        """
+        end_time = time.time()  # 记录结束时间
+        if not task.get("timeout"):
+            # 检测延迟上限：任务在上一次查询(或提交)之后的某个时刻完成
+            latency = end_time - (task.get("prev_poll") or task["start_time"])
+            logger.info(f"分类：{task['key']} 刷新任务执行结束,task_id：{task['task_id']}，task_status:{task_status}，"
+                        f"查询{task['polls']}次，完成检测延迟≤{latency:.1f}秒")
+        self.__remove_inflight(task["key"])
+        start_time = task["start_time"]
+        record = {
+            "classify": task["key"],
+            "start_time": time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time)),
+            "duration": round(end_time - start_time, 1),
+            "polls": task["polls"],
+            "task_status": task_status,
+            "timeout": task.get("timeout")
+        }
+        self.__save_history(record)
+        self.__job_progress(task.get("job"), task["key"], "超时" if task.get("timeout") else "成功", task, end_time)
+        if task.get("timeout"):
+            logger.warn(f"分类：{task['key']} 刷新超时，task_id：{task['task_id']}，{task['timeout']}，不再等待")
+            self.__save_history({**record, "task_id": task["task_id"]}, key="timeouts")
+            msgtext = f"分类：{task['key']} 刷新超时\n" + f"开始时间： {record['start_time']}\n" \
+                      + f"用时： {int(end_time - start_time)} 秒\n" + f"原因： {task['timeout']}\n"
+        else:
+            self.__save_rescanned(task["key"], record["start_time"])
+            # 任务在最近两次查询之间完成，取中点作为本次耗时
+            self.__save_estimate(task["key"],
+                                 ((task.get("prev_poll") or start_time) + end_time) / 2 - start_time)
+            msgtext =f"分类：{task['key']} 刷新成功\n"+f"开始时间： {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))}\n"+f"用时： {int(end_time - start_time)} 秒\n"
+        if not self._notifyaggregation and self._notify:
+            self.post_message(
+                mtype=NotificationType.Plugin,
+                title="【刷新极影视】",
+                text= msgtext)
+        return msgtext
+
+    def __save_estimate(self, classify: str, duration: float):
+        """
+        按指数加权移动平均更新分类的预计刷新耗时
+        """
+        with self._data_lock:
+            estimates = self.get_data("estimates") or {}
+            estimate = estimates.get(classify)
+            if estimate:
+                duration = self._estimate_alpha * duration + (1 - self._estimate_alpha) * estimate
+            estimates[classify] = round(duration, 1)
+            self.save_data("estimates", estimates)
+
+    def __save_rescanned(self, classify: str, start_time: str):
+        """
+        记录分类最近一次刷新成功的开始时间
+        """
+        with self._data_lock:
+            rescanned = self.get_data("rescanned") or {}
+            if start_time > rescanned.get(classify, ""):
+                rescanned[classify] = start_time
+                self.save_data("rescanned", rescanned)
+
+    def __save_history(self, record: dict, key: str = "history"):
+        """
+        保存刷新记录、超时记录，只保留最近的记录
+        """
+        with self._data_lock:
+            history = self.get_data(key) or []
+            history.append(record)
+            self.save_data(key, history[-self._history_limit:])
 
     @staticmethod
-    def generate_string():
-        timestamp = str(time.time())  # 获取当前的时间戳
-        four_digit_random = str(random.randint(1000,9999))  # 生成四位的随机数
-        return f"{timestamp}_{four_digit_random}"  # 返回格式化后的字符串
+    def __percentile(values: List[float], percent: int) -> float:
+        """
+        最近秩法计算百分位数
+        """
+        values = sorted(values)
+        index = max(math.ceil(percent / 100 * len(values)) - 1, 0)
+        return values[index]
 
     @staticmethod
     def get_command() -> List[Dict[str, Any]]:
@@ -291,7 +1409,61 @@ class ZspaceMediaFresh(_PluginBase):
         }]
 
     def get_api(self) -> List[Dict[str, Any]]:
-        pass
+        """
+        刷新任务接口，需传入apikey
+        """
+        return [{
+            "path": "/refresh",
+            "endpoint": self.api_refresh,
+            "methods": ["GET"],
+            "summary": "刷新极影视",
+            "description": "提交极影视刷新任务，立即返回任务ID",
+        }, {
+            "path": "/jobs",
+            "endpoint": self.api_jobs,
+            "methods": ["GET"],
+            "summary": "极影视刷新任务列表",
+            "description": "查询最近的极影视刷新任务",
+        }, {
+            "path": "/job",
+            "endpoint": self.api_job,
+            "methods": ["GET"],
+            "summary": "极影视刷新任务进度",
+            "description": "按任务ID查询各分类的刷新进度",
+        }]
+
+    def api_refresh(self, apikey: str) -> schemas.Response:
+        """
+        API提交刷新任务
+        """
+        if apikey != settings.API_TOKEN:
+            return schemas.Response(success=False, message="API密钥错误")
+        job = self.__submit_job("API")
+        if not job:
+            return schemas.Response(success=False, message="极空间地址或cookie未设置")
+        return schemas.Response(success=True, message="刷新任务已提交", data=self.__job_info(job))
+
+    def api_jobs(self, apikey: str) -> schemas.Response:
+        """
+        API查询刷新任务列表，最新的在前
+        """
+        if apikey != settings.API_TOKEN:
+            return schemas.Response(success=False, message="API密钥错误")
+        with self._jobs_lock:
+            jobs = list(self._jobs.values())
+        return schemas.Response(success=True, data={"jobs": [self.__job_info(job) for job in reversed(jobs)]})
+
+    def api_job(self, apikey: str, job_id: str) -> schemas.Response:
+        """
+        API查询刷新任务各分类的刷新进度
+        """
+        if apikey != settings.API_TOKEN:
+            return schemas.Response(success=False, message="API密钥错误")
+        with self._jobs_lock:
+            job = self._jobs.get(job_id)
+        if not job:
+            return schemas.Response(success=False, message=f"刷新任务不存在：{job_id}")
+        return schemas.Response(success=True, data=self.__job_info(job, detail=True))
 
     def get_form(self) -> Tuple[List[dict], Dict[str, Any]]:
         """
@@ -388,6 +1560,22 @@ class ZspaceMediaFresh(_PluginBase):
                                         }
                                     }
                                 ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'eventrefresh',
+                                            'label': '入库后刷新',
+                                        }
+                                    }
+                                ]
                             }
                         ]
                     },
@@ -469,6 +1657,144 @@ class ZspaceMediaFresh(_PluginBase):
                                 ]
                             }
                         ],
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'concurrency',
+                                            'label': '并发刷新数',
+                                            'placeholder': '3',
+                                            'hint': '同时刷新的分类数量上限，避免极空间负载过高'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, 'md': 3},
+                                "content": [
+                                    {
+                                        "component": "VSelect",
+                                        "props": {
+                                            "chips": True,
+                                            "multiple": False,
+                                            "model": "pollmode",
+                                            "label": "轮询策略",
+                                            "items": [{"title": "指数退避", "value": "backoff"},
+                                                      {"title": "固定间隔", "value": "fixed"}
+                                                      ],
+                                            'hint': '固定间隔使用等待时间查询刷新状态'
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 2
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'pollinitial',
+                                            'label': '首次查询(秒)',
+                                            'placeholder': '5',
+                                            'hint': '指数退避首次查询间隔'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 2
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'pollmax',
+                                            'label': '间隔上限(秒)',
+                                            'placeholder': '120',
+                                            'hint': '指数退避最大查询间隔'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 2
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'debounce',
+                                            'label': '入库静默期(秒)',
+                                            'placeholder': '30',
+                                            'hint': '入库后刷新：最后一次入库后等待该时间再刷新'
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                "component": "VCol",
+                                "props": {"cols": 12, 'md': 3},
+                                "content": [
+                                    {
+                                        "component": "VSelect",
+                                        "props": {
+                                            "chips": True,
+                                            "multiple": False,
+                                            "model": "engine",
+                                            "label": "刷新引擎",
+                                            "items": [{"title": "线程", "value": "thread"},
+                                                      {"title": "asyncio", "value": "asyncio"}
+                                                      ],
+                                            'hint': 'asyncio在事件循环中等待刷新状态，不占用定时任务线程'
+                                        },
+                                    }
+                                ],
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 3
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'maxduration',
+                                            'label': '最长刷新时间(分钟)',
+                                            'placeholder': '自动',
+                                            'hint': '分类刷新超过该时间视为超时，不再等待，超时不推进入库记录水位线；留空按预计耗时的4倍自动设置(至少180分钟)，0为不限制'
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
                     },{
                         "component": "VRow",
                         "content": [          
@@ -476,7 +1802,7 @@ class ZspaceMediaFresh(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 6
+                                    'md': 5
                                 },
                                 'content': [
                                     {
@@ -491,7 +1817,7 @@ class ZspaceMediaFresh(_PluginBase):
                                 'component': 'VCol',
                                 'props': {
                                     'cols': 12,
-                                    'md': 6
+                                    'md': 5
                                 },
                                 'content': [
                                     {
@@ -503,6 +1829,23 @@ class ZspaceMediaFresh(_PluginBase):
                                         }
                                     }
                                 ]
+                            },{
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 2
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'cachettl',
+                                            'label': '分类缓存(分钟)',
+                                            'placeholder': '60',
+                                            'hint': '极影视分类列表缓存时间，0为不缓存'
+                                        }
+                                    }
+                                ]
                             }
                         ],
                     },
@@ -548,7 +1891,55 @@ class ZspaceMediaFresh(_PluginBase):
                                 ]
                             }
                         ],
-                    }, 
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextarea',
+                                        'props': {
+                                            'model': 'pathmapping',
+                                            'label': '目录映射',
+                                            'rows': 3,
+                                            'placeholder': '每行一个，格式：目录#分类名1,分类名2\n如：/网盘/电影#电影\n/网盘/动漫#动漫,电视剧',
+                                            'hint': '入库目录只刷新对应的分类，按最长目录匹配，未匹配的目录按电影、电视剧分类名刷新'
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
+                    },
+                    {
+                        "component": "VRow",
+                        "content": [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextarea',
+                                        'props': {
+                                            'model': 'zspnodes',
+                                            'label': '多极空间',
+                                            'rows': 3,
+                                            'placeholder': '[{"name": "书房", "host": "http://192.168.1.10:5055", "cookie": "token=...; device_id=...", '
+                                                           '"startswith": "/书房", "moivelib": "电影", "tvlib": "电视剧", '
+                                                           '"pathmapping": ["/书房/动漫#动漫"], "concurrency": 3}]',
+                                            'hint': 'JSON数组，配置其他极空间，各极空间并行刷新，通知合并发送'
+                                        }
+                                    }
+                                ]
+                            }
+                        ],
+                    },
                     {
                         "component": "VRow",
                         "content": [
@@ -602,21 +1993,169 @@ class ZspaceMediaFresh(_PluginBase):
             "cron": "5 1 * * *",
             "timescope": 1,
             "waittime":60,
-            "unit":"day"
+            "unit":"day",
+            "concurrency": 3,
+            "pollmode": "backoff",
+            "pollinitial": 5,
+            "pollmax": 120,
+            "eventrefresh": False,
+            "debounce": 30,
+            "cachettl": 60,
+            "engine": "thread",
+            "maxduration": "",
+            "zspnodes": ""
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        刷新耗时统计页面
+        """
+        history = self.get_data("history")
+        if not history:
+            return [
+                {
+                    'component': 'div',
+                    'text': '暂无数据',
+                    'props': {
+                        'class': 'text-center',
+                    }
+                }
+            ]
+        # 按分类汇总耗时，超时的刷新不计入耗时统计
+        durations = {}
+        timeouts = {}
+        for record in history:
+            durations.setdefault(record["classify"], [])
+            if record.get("timeout"):
+                timeouts[record["classify"]] = timeouts.get(record["classify"], 0) + 1
+            else:
+                durations[record["classify"]].append(record["duration"])
+        estimates = self.get_data("estimates") or {}
+        stat_rows = [
+            {
+                'component': 'tr',
+                'content': [
+                    {'component': 'td', 'text': classify},
+                    {'component': 'td', 'text': f"{estimates[classify]:.0f}秒" if estimates.get(classify) else "-"},
+                    {'component': 'td', 'text': len(values) + timeouts.get(classify, 0)},
+                    {'component': 'td', 'text': timeouts.get(classify, 0)},
+                    {'component': 'td', 'text': f"{self.__percentile(values, 50):.0f}秒" if values else "-"},
+                    {'component': 'td', 'text': f"{self.__percentile(values, 95):.0f}秒" if values else "-"},
+                    {'component': 'td', 'text': f"{max(values):.0f}秒" if values else "-"}
+                ]
+            } for classify, values in sorted(durations.items(),
+                                             key=lambda item: -self.__percentile(item[1], 95) if item[1] else 0)
+        ]
+        history_rows = [
+            {
+                'component': 'tr',
+                'content': [
+                    {'component': 'td', 'text': record["start_time"]},
+                    {'component': 'td', 'text': record["classify"]},
+                    {'component': 'td', 'text': f"{record['duration']:.0f}秒"},
+                    {'component': 'td', 'text': record["polls"]},
+                    {'component': 'td', 'text': f"超时：{record['timeout']}" if record.get("timeout")
+                    else record["task_status"]}
+                ]
+            } for record in reversed(history[-50:])
+        ]
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '分类'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '预计耗时'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '刷新次数'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '超时次数'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': 'P50耗时'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': 'P95耗时'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '最长耗时'}
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': stat_rows
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '开始时间'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '分类'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '耗时'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '查询次数'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': 'task_status'}
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': history_rows
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def stop_service(self):
         """
         退出插件
         """
         try:
+            # 通知刷新中的任务退出，重新初始化插件时创建新的退出事件
+            if self._event:
+                self._event.set()
             if self._scheduler:
                 self._scheduler.remove_all_jobs()
                 if self._scheduler.running:
                     self._scheduler.shutdown()
                 self._scheduler = None
+            if self._loop:
+                # 取消事件循环中的刷新任务，等待其保存未完成的任务后停止
+                asyncio.run_coroutine_threadsafe(self.__shutdown_loop(), self._loop).result(timeout=10)
+                self._loop = None
+            if self._job_executor:
+                # 排队中的刷新任务取消，等待刷新中的任务随退出事件中断，避免重新初始化清除退出事件后继续使用旧连接刷新
+                self._job_executor.shutdown(wait=True, cancel_futures=True)
+                self._job_executor = None
+                with self._jobs_lock:
+                    for job in self._jobs.values():
+                        if not job["end_time"] and job["status"] == "排队中":
+                            job["status"], job["end_time"] = "已取消", time.time()
+            for node in self._nodes:
+                node["client"].close()
+            self._nodes = []
         except Exception as e:
             logger.error("退出插件失败：%s" % str(e))
\ No newline at end of file
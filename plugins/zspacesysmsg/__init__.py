@@ -2,8 +2,7 @@ from datetime import datetime, timedelta
 from typing import Optional, Any, List, Dict, Tuple
 
 import pytz
-import random
-import time
+import re
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
 
@@ -11,8 +10,8 @@ from app.core.event import eventmanager, Event
 from app.core.config import settings
 from app.log import logger
 from app.plugins import _PluginBase
+from app.plugins.zspacesysmsg.zspaceclient import ZspaceClient
 from app.schemas.types import EventType, NotificationType
-from app.utils.http import RequestUtils
 
 
 class ZspaceSysMsg(_PluginBase):
@@ -23,7 +22,7 @@ class ZspaceSysMsg(_PluginBase):
     # 插件图标
     plugin_icon = "Zspace_A.png"
     # 插件版本
-    plugin_version = "1.0"
+    plugin_version = "1.6"
     # 插件作者
     plugin_author = "gxterry"
     # 作者主页
@@ -41,7 +40,28 @@ class ZspaceSysMsg(_PluginBase):
     _cron = None
     _zspcookie = None
     _zsphost = None
+    _adaptive = False
+    _mininterval = None
+    _maxinterval = None
+    _digest = False
+    _digestwindow = None
+    _criticalwords = None
+    # 自适应轮询当前间隔(秒)
+    _interval = None
+    # 最近的获取记录 {"time": 获取时间, "count": 新消息数量，失败为None, "interval": 之后的间隔}
+    _polls: List[dict] = []
+    # 获取记录保留条数
+    _poll_limit = 100
+    _client: Optional[ZspaceClient] = None
     _scheduler: Optional[BackgroundScheduler] = None
+    # 每页获取的消息数量
+    _page_size = 50
+    # 单次推送最多获取的页数
+    _max_pages = 20
+    # 单次设为已读的消息数量上限
+    _known_chunk = 100
+    # 已推送消息ID保留个数
+    _delivered_limit = 1000
 
     def init_plugin(self, config: dict = None):
         # 停止现有任务
@@ -52,11 +72,21 @@ class ZspaceSysMsg(_PluginBase):
             self._cron = config.get("cron")
             self._zspcookie = config.get("zspcookie")
             self._zsphost = config.get("zsphost")
+            self._adaptive = config.get("adaptive")
+            self._mininterval = int(config.get("mininterval") or 30)
+            self._maxinterval = max(int(config.get("maxinterval") or 600), self._mininterval)
+            self._interval = self._mininterval
+            self._polls = []
+            self._digest = config.get("digest")
+            self._digestwindow = config.get("digestwindow") or 0
+            self._criticalwords = config.get("criticalwords") or "硬盘,磁盘,RAID,存储池,故障,异常,失败,告警,温度,损坏"
             if self._zsphost:
                 if not self._zsphost.startswith("http"):
                     self._zsphost = "http://" + self._zsphost
                 if self._zsphost.endswith("/"):
                     self._zsphost = self._zsphost[:-1]
+            if self._zsphost and self._zspcookie:
+                self._client = ZspaceClient(self._zsphost, self._zspcookie)
             # 加载模块
             if self._enabled or self._onlyonce:
                 # 定时服务
@@ -72,8 +102,12 @@ class ZspaceSysMsg(_PluginBase):
                     self._onlyonce = False
                     # 保存配置
                     self.__update_config()
+                # 自适应轮询，按最短间隔开始
+                if self._enabled and self._adaptive and self._client:
+                    logger.info(f"极空间系统通知自适应轮询，间隔{self._mininterval}-{self._maxinterval}秒")
+                    self.__schedule_next()
                 # 周期运行
-                if self._cron:
+                elif self._cron:
                     try:
                         self._scheduler.add_job(func=self.pushmsg,
                                                 trigger=CronTrigger.from_crontab(self._cron),
@@ -94,52 +128,254 @@ class ZspaceSysMsg(_PluginBase):
                 "cron": self._cron,
                 "enabled": self._enabled,
                 "zspcookie": self._zspcookie,
-                "zsphost": self._zsphost
+                "zsphost": self._zsphost,
+                "adaptive": self._adaptive,
+                "mininterval": self._mininterval,
+                "maxinterval": self._maxinterval,
+                "digest": self._digest,
+                "digestwindow": self._digestwindow,
+                "criticalwords": self._criticalwords
             }
         )
 
     def pushmsg(self):
         """
-        极空间系统通知推送
+        极空间系统通知推送，记录本次获取结果，自适应轮询时安排下一次获取
         """
-        if not self._zsphost or not self._zspcookie:
-            return False
-        cookie = RequestUtils.cookie_parse(self._zspcookie)
-        token = cookie['token']
-        # device_id = cookie['device_id']
-        # 只获取notify类型消息
-        formdata = {"type": "notify", "start_id": 0, "num": "5", "token": token}
-        # 获取消息列表
-        list_url = "%s/action/list?&rnd=%s&webagent=v2" % (self._zsphost, self.generate_string())
-        try:
-            rsp_body = RequestUtils(cookies=self._zspcookie).post_res(list_url, formdata)
-            res = rsp_body.json()
-            logger.debug(f"获取极空间系统消息 ：{res}")
-            if res and res["code"] == "200":
-                if res["data"]["list"] and isinstance(res["data"]["list"], list):
-                    for message in res["data"]["list"]:
-                        if message['is_new'] == 1:
-                            self.post_message(
-                                mtype=NotificationType.Plugin,
-                                title=f"【极空间系统消息】",
-                                text=f"{message['title']}\n内容:{message['content']} \n 时间:{message['created_at']}")
-                            #设置已读
-                            list_url = "%s/action/known?&rnd=%s&webagent=v2" % (self._zsphost, self.generate_string())
-                            form = {"ids": message["id"], "type": "notify", "start_id": 0, "num": "20", "token": token}
-                            RequestUtils(cookies=self._zspcookie).post_res(list_url, form)
+        count = self.__pushmsg()
+        if self._adaptive and self._enabled:
+            # 有新消息时按最短间隔获取，没有新消息或获取失败时间隔加倍，不超过最长间隔
+            if count:
+                self._interval = self._mininterval
+            else:
+                self._interval = min(self._interval * 2, self._maxinterval)
+            self.__schedule_next()
+        self._polls.append({"time": datetime.now().strftime('%Y-%m-%d %H:%M:%S'), "count": count,
+                            "interval": self._interval if self._adaptive else None})
+        self._polls = self._polls[-self._poll_limit:]
+        return count is not None
+
+    def __schedule_next(self):
+        """
+        按当前间隔安排下一次获取
+        """
+        if not self._scheduler:
+            return
+        self._scheduler.add_job(self.pushmsg, 'date',
+                                run_date=datetime.now(
+                                    tz=pytz.timezone(settings.TZ)) + timedelta(seconds=self._interval),
+                                id="zspacesysmsg_adaptive",
+                                replace_existing=True,
+                                name="极空间系统通知")
+        logger.debug(f"{self._interval}秒后获取极空间系统消息")
 
+    def __hit_rate(self) -> Optional[float]:
+        """
+        最近获取到新消息的比例
+        """
+        if not self._polls:
+            return None
+        return len([poll for poll in self._polls if poll["count"]]) / len(self._polls)
+
+    def __pushmsg(self) -> Optional[int]:
+        """
+        从最新的消息开始按页获取，直到上次推送时已看到的消息ID，按时间顺序推送其中的未读消息
+        返回新消息数量，获取失败返回None
+        """
+        if not self._client:
+            return None
+        # 上次推送时已看到的最新消息ID
+        cursor = self.get_data("cursor") or 0
+        new_messages = []
+        start_id = 0
+        try:
+            for _ in range(self._max_pages):
+                messages = self.__list_messages(start_id)
+                if messages is None:
+                    # 获取失败，不更新游标，下次重新获取
+                    return None
+                # 消息按ID倒序，游标之后的为新消息
+                page_messages = [message for message in messages if int(message["id"]) > cursor]
+                new_messages.extend(page_messages)
+                # 已到达游标、没有更多消息，或首次运行只获取第一页
+                if len(page_messages) < len(messages) or len(messages) < self._page_size or not cursor:
+                    break
+                start_id = messages[-1]["id"]
             else:
-                logger.info(f"获取极空间系统消息{res}")
+                logger.warn(f"极空间系统消息超过{self._max_pages * self._page_size}条，更早的消息不再推送")
+            if not new_messages:
+                if self._digest:
+                    # 汇总时间窗口到期时推送待汇总的消息，设为已读失败的消息游标回退，下次重新获取后只设为已读
+                    failed = self.__mark_known(self.__flush_digest())
+                    if failed:
+                        self.save_data("cursor", min(cursor, min(failed) - 1))
+                return 0
+            logger.info(f"获取到{len(new_messages)}条新的极空间系统消息")
+            delivered, failed = self.__push_messages(new_messages)
+            # 推送成功的消息一起设为已读
+            failed += self.__mark_known(delivered)
         except Exception as e:
             logger.error(f"极空间系统消息推送" + str(e))
-            return False
-        return False
+            return None
+        cursor = max(int(message["id"]) for message in new_messages)
+        if failed:
+            # 推送或设为已读失败的消息下次重新获取，已推送的只设为已读
+            cursor = min(cursor, min(failed) - 1)
+        self.save_data("cursor", cursor)
+        return len(new_messages)
+
+    def __list_messages(self, start_id) -> Optional[List[dict]]:
+        """
+        获取一页系统消息，start_id 为上一页最后一条消息ID，获取失败返回None
+        """
+        # 只获取notify类型消息
+        formdata = {"type": "notify", "start_id": start_id, "num": str(self._page_size), "token": self._client.token}
+        res = self._client.post("/action/list", formdata)
+        logger.debug(f"获取极空间系统消息 ：{res}")
+        if not res or res["code"] != "200":
+            logger.info(f"获取极空间系统消息{res}")
+            return None
+        if not res["data"] or not isinstance(res["data"].get("list"), list):
+            return []
+        return res["data"]["list"]
+
+    def __push_messages(self, messages: List[dict]) -> Tuple[List[int], List[int]]:
+        """
+        推送未读消息，较早的消息先推送，返回推送成功和失败的消息ID
+        已推送过但未设为已读的消息不再重复推送，直接设为已读
+        """
+        # 已推送的消息 消息ID -> 推送时间，按推送顺序保留最近的记录
+        pushed = self.get_data("delivered") or {}
+        delivered = []
+        failed = []
+        unread = []
+        for message in reversed(messages):
+            if message['is_new'] != 1:
+                continue
+            if str(message["id"]) in pushed:
+                logger.info(f"极空间系统消息{message['id']}已推送过，不再重复推送")
+                delivered.append(int(message["id"]))
+                continue
+            unread.append(message)
+        if self._digest:
+            # 汇总推送：未读消息加入待汇总，时间窗口到期或有重要消息时合并推送一条
+            self.__buffer_digest(unread)
+            return delivered + self.__flush_digest(), failed
+        posted = []
+        for message in unread:
+            try:
+                self.post_message(
+                    mtype=NotificationType.Plugin,
+                    title=f"【极空间系统消息】",
+                    text=f"{message['title']}\n内容:{message['content']} \n 时间:{message['created_at']}")
+                posted.append(int(message["id"]))
+            except Exception as e:
+                logger.error(f"极空间系统消息{message['id']}推送失败：" + str(e))
+                failed.append(int(message["id"]))
+        # 设为已读前保存，设为已读失败或重启后不重复推送
+        self.__save_delivered(posted)
+        return delivered + posted, failed
+
+    def __save_delivered(self, ids: List[int]):
+        """
+        记录已推送的消息ID
+        """
+        if not ids:
+            return
+        pushed = self.get_data("delivered") or {}
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        for mid in ids:
+            pushed[str(mid)] = now
+        self.save_data("delivered", dict(list(pushed.items())[-self._delivered_limit:]))
+
+    def __buffer_digest(self, messages: List[dict]):
+        """
+        未读消息加入待汇总消息，保存在插件数据中，重启后继续汇总
+        """
+        if not messages:
+            return
+        digest = self.get_data("digest") or {}
+        buffered = digest.get("messages") or []
+        ids = [message["id"] for message in buffered]
+        buffered += [{"id": message["id"], "title": message["title"], "content": message["content"],
+                      "created_at": message["created_at"]} for message in messages if message["id"] not in ids]
+        self.save_data("digest", {"since": digest.get("since") or datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                  "messages": buffered})
+
+    def __flush_digest(self) -> List[int]:
+        """
+        时间窗口到期或有重要消息时，待汇总的消息合并为一条通知推送，返回推送成功的消息ID
+        """
+        digest = self.get_data("digest") or {}
+        messages = digest.get("messages") or []
+        if not messages:
+            return []
+        critical = [message for message in messages if self.__is_critical(message)]
+        since = datetime.strptime(digest["since"], '%Y-%m-%d %H:%M:%S')
+        if not critical and datetime.now() < since + timedelta(minutes=float(self._digestwindow)):
+            return []
+        try:
+            self.post_message(
+                mtype=NotificationType.Plugin,
+                title=f"【极空间系统消息】{len(messages)}条",
+                text=self.__digest_text(messages, critical))
+        except Exception as e:
+            # 保留待汇总的消息，下次重新推送
+            logger.error(f"极空间系统消息汇总推送失败：" + str(e))
+            return []
+        ids = [int(message["id"]) for message in messages]
+        self.__save_delivered(ids)
+        self.save_data("digest", {})
+        logger.info(f"汇总推送极空间系统消息{len(messages)}条，其中重要消息{len(critical)}条")
+        return ids
+
+    def __is_critical(self, message: dict) -> bool:
+        """
+        标题或内容包含重要消息关键词
+        """
+        text = f"{message['title']}{message['content']}"
+        return any(word.strip() and word.strip() in text for word in re.split(r"[,，]", self._criticalwords or ""))
 
     @staticmethod
-    def generate_string():
-        timestamp = str(time.time())  # 获取当前的时间戳
-        four_digit_random = str(random.randint(1000, 9999))  # 生成四位的随机数
-        return f"{timestamp}_{four_digit_random}"  # 返回格式化后的字符串
+    def __digest_text(messages: List[dict], critical: List[dict]) -> str:
+        """
+        汇总消息内容：重要消息在前逐条列出，其余消息按标题汇总数量和时间范围
+        """
+        lines = []
+        if critical:
+            lines.append("重要消息：")
+            for message in critical:
+                lines.append(f"{message['title']}\n内容:{message['content']} \n 时间:{message['created_at']}")
+        # 标题 -> [数量, 最早时间, 最晚时间]
+        titles = {}
+        for message in messages:
+            if message in critical:
+                continue
+            summary = titles.setdefault(message["title"], [0, message["created_at"], message["created_at"]])
+            summary[0] += 1
+            summary[1] = min(summary[1], message["created_at"])
+            summary[2] = max(summary[2], message["created_at"])
+        if titles:
+            if critical:
+                lines.append("其他消息：")
+            for title, (count, first, last) in sorted(titles.items(), key=lambda item: -item[1][0]):
+                lines.append(f"{title} ×{count}  {first}" + (f" ~ {last}" if last != first else ""))
+        return "\n".join(lines)
+
+    def __mark_known(self, ids: List[int]) -> List[int]:
+        """
+        设置已读，多条消息ID逗号分割一次提交，超过上限时分批提交，返回设为已读失败的消息ID
+        """
+        failed = []
+        for index in range(0, len(ids), self._known_chunk):
+            chunk = ids[index:index + self._known_chunk]
+            form = {"ids": ",".join(str(mid) for mid in chunk), "type": "notify", "start_id": 0, "num": "20",
+                    "token": self._client.token}
+            res = self._client.post("/action/known", form)
+            if not res or res.get("code") != "200":
+                logger.info(f"极空间系统消息设为已读失败：{res}")
+                failed.extend(chunk)
+        return failed
 
     def get_state(self) -> bool:
         return self._enabled
@@ -259,6 +495,119 @@ class ZspaceSysMsg(_PluginBase):
                             }
                         ],
                     },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'adaptive',
+                                            'label': '自适应轮询',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'mininterval',
+                                            'label': '最短间隔(秒)',
+                                            'type': 'number',
+                                            'placeholder': '30'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'maxinterval',
+                                            'label': '最长间隔(秒)',
+                                            'type': 'number',
+                                            'placeholder': '600'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VRow',
+                        'content': [
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VSwitch',
+                                        'props': {
+                                            'model': 'digest',
+                                            'label': '汇总推送',
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'digestwindow',
+                                            'label': '汇总时间窗口(分钟)',
+                                            'type': 'number',
+                                            'placeholder': '0为每次获取汇总一次'
+                                        }
+                                    }
+                                ]
+                            },
+                            {
+                                'component': 'VCol',
+                                'props': {
+                                    'cols': 12,
+                                    'md': 4
+                                },
+                                'content': [
+                                    {
+                                        'component': 'VTextField',
+                                        'props': {
+                                            'model': 'criticalwords',
+                                            'label': '重要消息关键词',
+                                            'placeholder': '多个逗号分割'
+                                        }
+                                    }
+                                ]
+                            }
+                        ]
+                    },
                     {
                         'component': 'VRow',
                         'content': [
@@ -273,7 +622,11 @@ class ZspaceSysMsg(_PluginBase):
                                         'props': {
                                             'type': 'info',
                                             'variant': 'tonal',
-                                            'text': '- cookie：极空间web端cookie',
+                                            'text': '- cookie：极空间web端cookie\n'
+                                                    '- 自适应轮询：启用后忽略执行周期，获取到新消息后按最短间隔获取，'
+                                                    '没有新消息时间隔逐次加倍直到最长间隔\n'
+                                                    '- 汇总推送：时间窗口内的消息合并为一条通知，包含重要消息关键词的消息立即推送并列在最前，'
+                                                    '其余消息按标题汇总数量',
                                             'style': 'white-space: pre-line;'
                                         }
                                     }
@@ -285,11 +638,95 @@ class ZspaceSysMsg(_PluginBase):
             }
         ], {
             "enabled": False,
-            "onlyonce": False
+            "onlyonce": False,
+            "adaptive": False,
+            "mininterval": 30,
+            "maxinterval": 600,
+            "digest": False,
+            "digestwindow": 0,
+            "criticalwords": "硬盘,磁盘,RAID,存储池,故障,异常,失败,告警,温度,损坏"
         }
 
     def get_page(self) -> List[dict]:
-        pass
+        """
+        获取记录页面：当前轮询间隔、最近命中率和获取记录
+        """
+        if not self._polls:
+            return [
+                {
+                    'component': 'div',
+                    'text': '暂无数据',
+                    'props': {
+                        'class': 'text-center',
+                    }
+                }
+            ]
+        hit_rate = self.__hit_rate()
+        summary = f"当前间隔：{self._interval}秒" if self._adaptive else f"执行周期：{self._cron}"
+        summary += f"，最近{len(self._polls)}次获取命中率：{hit_rate:.0%}"
+        if self._digest:
+            summary += f"，待汇总消息：{len((self.get_data('digest') or {}).get('messages') or [])}条"
+        poll_rows = [
+            {
+                'component': 'tr',
+                'content': [
+                    {'component': 'td', 'text': poll["time"]},
+                    {'component': 'td', 'text': "获取失败" if poll["count"] is None else poll["count"]},
+                    {'component': 'td', 'text': f"{poll['interval']}秒" if poll["interval"] else "-"}
+                ]
+            } for poll in reversed(self._polls[-50:])
+        ]
+        return [
+            {
+                'component': 'VRow',
+                'content': [
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VAlert',
+                                'props': {
+                                    'type': 'info',
+                                    'variant': 'tonal',
+                                    'text': summary
+                                }
+                            }
+                        ]
+                    },
+                    {
+                        'component': 'VCol',
+                        'props': {
+                            'cols': 12,
+                        },
+                        'content': [
+                            {
+                                'component': 'VTable',
+                                'props': {
+                                    'hover': True
+                                },
+                                'content': [
+                                    {
+                                        'component': 'thead',
+                                        'content': [
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '获取时间'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '新消息'},
+                                            {'component': 'th', 'props': {'class': 'text-start ps-4'}, 'text': '下次间隔'}
+                                        ]
+                                    },
+                                    {
+                                        'component': 'tbody',
+                                        'content': poll_rows
+                                    }
+                                ]
+                            }
+                        ]
+                    }
+                ]
+            }
+        ]
 
     def stop_service(self):
         """
@@ -301,5 +738,8 @@ class ZspaceSysMsg(_PluginBase):
                 if self._scheduler.running:
                     self._scheduler.shutdown()
                 self._scheduler = None
+            if self._client:
+                self._client.close()
+                self._client = None
         except Exception as e:
             logger.error("退出插件失败：%s" % str(e))
\ No newline at end of file
@@ -0,0 +1,54 @@
+import random
+import time
+from typing import Optional
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from app.log import logger
+from app.utils.http import RequestUtils
+
+
+class ZspaceClient:
+    """
+    极空间web接口客户端，同一极空间的请求复用连接池和登录信息
+    """
+
+    def __init__(self, host: str, cookie: str, pool_size: int = 10, timeout: int = 30):
+        self.host = host
+        self.cookie = cookie
+        cookies = RequestUtils.cookie_parse(cookie)
+        self.token = cookies.get("token")
+        self.device_id = cookies.get("device_id")
+        self._session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._request = RequestUtils(headers={"Content-Type": "application/x-www-form-urlencoded"},
+                                     cookies=cookies,
+                                     session=self._session,
+                                     timeout=timeout)
+
+    def post(self, path: str, data: dict = None) -> Optional[dict]:
+        """
+        请求极空间接口，返回json数据，请求失败返回None
+        """
+        url = "%s%s?&rnd=%s&webagent=v2" % (self.host, path, self.generate_string())
+        res = self._request.post_res(url, data)
+        if res is None:
+            logger.error(f"请求极空间接口失败：{path}")
+            return None
+        try:
+            return res.json()
+        except ValueError:
+            logger.error(f"极空间接口返回数据异常：{path}，状态码：{res.status_code}")
+            return None
+
+    def close(self):
+        self._session.close()
+
+    @staticmethod
+    def generate_string():
+        timestamp = str(time.time())  # 获取当前的时间戳
+        four_digit_random = str(random.randint(1000, 9999))  # 生成四位的随机数
+        return f"{timestamp}_{four_digit_random}"  # 返回格式化后的字符串